@@ -0,0 +1,512 @@
+/*
+ * Runs the tests of a program inside its container and measures every one of them.
+ *
+ * usage: harness <number of tests> <command> [args...]
+ *        harness -i <command> [args...]
+ *        harness -c <message>
+ *
+ * Simple tasks (the first form). The inputs are taken from the bundle /data/inputs
+ * (see tester/bundle.py). Every test is run in /work with its input as stdin and
+ * as /work/input.txt, stdout appended to the bundle /data/outputs and stderr captured
+ * into /work/stderr.txt. A program which prints nothing and writes /work/output.txt
+ * instead gets that file as its output.
+ * For every test a record is appended to /data/stats.txt and the beginning
+ * of its stderr is appended to the bundle /data/stderr.
+ * The output index line is written last, so a reader which sees an output
+ * also finds its record.
+ *
+ * Interactive tasks (-i). The harness connects to the tester's control socket
+ * /data/control.sock, says "ready" and then serves line messages:
+ *     next <test> [fifo|socket [slot]]
+ *                  - starts the program with stdin on /data/prog_in-<slot> and stdout
+ *                    on /data/prog_out-<slot> (fifo, the default) or both on a connection
+ *                    to the tester's socket /data/prog-<slot>.sock (socket),
+ *                    stderr goes to /data/stderr-<test>.txt; answers "started <test>".
+ *                    Without a slot the names have no "-<slot>". Programs of different
+ *                    slots run at the same time.
+ *     stop <test>  - kills the program; answers "done <test> <record>"
+ *     exit         - (or the end of the connection) finishes the run
+ * `-c` sends a single message, e.g. to report a compilation error.
+ *
+ * Limits are read from the environment: TIME_LIMIT_MS and MEMORY_LIMIT_KB,
+ * zero or unset means no limit. The time limit is enforced by wall clock (SIGKILL,
+ * simple tasks only) and by RLIMIT_CPU, the memory limit is checked against
+ * the peak resident set size. A record is
+ *     <verdict> <exit code> <signal> <wall ms> <cpu ms> <max rss kb>
+ * where verdict is OK, RE (runtime error), TL (time limit) or ML (memory limit).
+ */
+#include <errno.h>
+#include <fcntl.h>
+#include <signal.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <sys/mman.h>
+#include <sys/resource.h>
+#include <sys/socket.h>
+#include <sys/stat.h>
+#include <sys/time.h>
+#include <sys/un.h>
+#include <sys/wait.h>
+#include <time.h>
+#include <unistd.h>
+
+/* the mounts of the container, other directories are given by the harness tests */
+#ifndef DATA_DIR
+#define DATA_DIR "/data"
+#endif
+#ifndef WORK_DIR
+#define WORK_DIR "/work"
+#endif
+#define INPUTS_BIN DATA_DIR "/inputs.bin"
+#define INPUTS_IDX DATA_DIR "/inputs.idx"
+#define OUTPUTS_BIN DATA_DIR "/outputs.bin"
+#define OUTPUTS_IDX DATA_DIR "/outputs.idx"
+#define STDERR_BIN DATA_DIR "/stderr.bin"
+#define STDERR_IDX DATA_DIR "/stderr.idx"
+#define STATS DATA_DIR "/stats.txt"
+#define INPUT WORK_DIR "/input.txt"
+#define OUTPUT WORK_DIR "/output.txt"
+#define STDERR WORK_DIR "/stderr.txt"
+#define CONTROL_SOCKET DATA_DIR "/control.sock"
+#define PROG_IN DATA_DIR "/prog_in"
+#define PROG_OUT DATA_DIR "/prog_out"
+#define PROG_SOCKET DATA_DIR "/prog"
+/* bytes of stderr kept per test */
+#define STDERR_EXCERPT 2048
+#define TRUNCATED "\n[truncated]"
+#define MAX_MESSAGE 256
+#define MAX_RECORD 128
+/* interactive tests running at the same time, as MAX_SLOTS in tester/interactive_task/task.py */
+#define MAX_SLOTS 64
+
+struct redirect {
+    int fd;            /* or -1 to open `path` in the child */
+    const char *path;
+    int flags;
+};
+
+struct program {
+    pid_t pid;         /* 0 if the slot is free */
+    long test;
+    struct timespec start;
+};
+
+struct record {
+    const char *verdict;
+    int code;
+    int sig;
+    long wall_ms;
+    long cpu_ms;
+    long rss_kb;
+};
+
+static pid_t child;
+static volatile sig_atomic_t timed_out;
+static long time_limit;
+static long memory_limit;
+
+static void on_alarm(int sig) {
+    (void)sig;
+    timed_out = 1;
+    kill(child, SIGKILL);
+}
+
+static long timeval_ms(struct timeval t) {
+    return t.tv_sec * 1000L + t.tv_usec / 1000;
+}
+
+static long elapsed_ms(struct timespec start) {
+    struct timespec end;
+    clock_gettime(CLOCK_MONOTONIC, &end);
+    return (end.tv_sec - start.tv_sec) * 1000L + (end.tv_nsec - start.tv_nsec) / 1000000L;
+}
+
+static long env_limit(const char *name) {
+    const char *value = getenv(name);
+    return value != NULL ? atol(value) : 0;
+}
+
+static int open_or_die(const char *path, int flags) {
+    int fd = open(path, flags, 0666);
+    if (fd < 0) {
+        perror(path);
+        exit(2);
+    }
+    return fd;
+}
+
+static int write_all(int fd, const char *data, size_t length) {
+    while (length > 0) {
+        ssize_t written = write(fd, data, length);
+        if (written < 0) {
+            if (errno == EINTR)
+                continue;
+            return -1;
+        }
+        data += written;
+        length -= written;
+    }
+    return 0;
+}
+
+static off_t file_size(int fd) {
+    struct stat st;
+    return fstat(fd, &st) == 0 ? st.st_size : 0;
+}
+
+/* starts the command in a process group of its own with stdin, stdout and stderr redirected */
+static pid_t spawn(char **command, struct redirect redirects[3]) {
+    pid_t pid = fork();
+    if (pid < 0) {
+        perror("harness: fork");
+        exit(2);
+    }
+    if (pid == 0) {
+        /* to kill whatever the program leaves behind */
+        setpgid(0, 0);
+        for (int target = 0; target < 3; target++) {
+            int fd = redirects[target].fd;
+            if (fd < 0)
+                fd = open(redirects[target].path, redirects[target].flags, 0666);
+            if (fd < 0) {
+                perror(redirects[target].path);
+                _exit(127);
+            }
+            dup2(fd, target);
+        }
+        if (time_limit > 0) {
+            rlim_t seconds = (time_limit + 999) / 1000;
+            struct rlimit cpu = {seconds, seconds + 1};
+            setrlimit(RLIMIT_CPU, &cpu);
+        }
+        execvp(command[0], command);
+        perror(command[0]);
+        _exit(127);
+    }
+    setpgid(pid, pid);
+    return pid;
+}
+
+/*
+ * Waits for the program and kills the rest of its group.
+ * `stopped` - the program has been killed by the harness, which is not its failure
+ */
+static void finish(pid_t pid, struct timespec start, int stopped, struct record *r) {
+    int status;
+    struct rusage usage;
+    while (wait4(pid, &status, 0, &usage) < 0) {
+        if (errno != EINTR) {
+            perror("harness: wait4");
+            exit(2);
+        }
+    }
+    r->wall_ms = elapsed_ms(start);
+    kill(-pid, SIGKILL);
+
+    r->cpu_ms = timeval_ms(usage.ru_utime) + timeval_ms(usage.ru_stime);
+    r->rss_kb = usage.ru_maxrss;
+    r->code = WIFEXITED(status) ? WEXITSTATUS(status) : 0;
+    r->sig = WIFSIGNALED(status) ? WTERMSIG(status) : 0;
+
+    int crashed = r->sig && !(stopped && r->sig == SIGKILL);
+    r->verdict = "OK";
+    if (r->sig == SIGXCPU || (time_limit > 0 && r->cpu_ms > time_limit))
+        r->verdict = "TL";
+    else if (memory_limit > 0 && r->rss_kb > memory_limit)
+        r->verdict = "ML";
+    else if (crashed || r->code)
+        r->verdict = "RE";
+}
+
+static void format_record(char *buffer, size_t size, const struct record *r) {
+    snprintf(buffer, size, "%s %d %d %ld %ld %ld",
+             r->verdict, r->code, r->sig, r->wall_ms, r->cpu_ms, r->rss_kb);
+}
+
+/* appends the beginning of the test's stderr to the stderr bundle */
+static void save_stderr(int err_fd, int bin_fd, int idx_fd) {
+    static char excerpt[STDERR_EXCERPT + sizeof(TRUNCATED)];
+    off_t size = file_size(err_fd);
+    ssize_t length = pread(err_fd, excerpt, STDERR_EXCERPT, 0);
+    if (length < 0)
+        length = 0;
+    if (size > length) {
+        memcpy(excerpt + length, TRUNCATED, sizeof(TRUNCATED) - 1);
+        length += sizeof(TRUNCATED) - 1;
+    }
+    off_t offset = file_size(bin_fd);
+    write_all(bin_fd, excerpt, length);
+    dprintf(idx_fd, "%lld %zd\n", (long long)offset, length);
+}
+
+/* appends a file to the outputs bundle, nothing if there is no file */
+static void append_file(const char *path, int bin_fd) {
+    static char buffer[1 << 16];
+    int fd = open(path, O_RDONLY);
+    if (fd < 0)
+        return;
+    ssize_t length;
+    while ((length = read(fd, buffer, sizeof(buffer))) > 0)
+        write_all(bin_fd, buffer, length);
+    close(fd);
+}
+
+static int run_tests(long n_tests, char **command) {
+    /* programs open input.txt and output.txt by relative paths */
+    if (chdir(WORK_DIR) < 0) {
+        perror(WORK_DIR);
+        return 2;
+    }
+    FILE *inputs_idx = fopen(INPUTS_IDX, "r");
+    if (inputs_idx == NULL) {
+        perror(INPUTS_IDX);
+        return 2;
+    }
+    int inputs_fd = open_or_die(INPUTS_BIN, O_RDONLY);
+    off_t inputs_size = file_size(inputs_fd);
+    const char *inputs = NULL;
+    if (inputs_size > 0) {
+        inputs = mmap(NULL, inputs_size, PROT_READ, MAP_PRIVATE, inputs_fd, 0);
+        if (inputs == MAP_FAILED) {
+            perror("harness: mmap");
+            return 2;
+        }
+    }
+
+    int outputs_fd = open_or_die(OUTPUTS_BIN, O_WRONLY | O_CREAT | O_APPEND);
+    int outputs_idx = open_or_die(OUTPUTS_IDX, O_WRONLY | O_CREAT | O_APPEND);
+    int stderr_fd = open_or_die(STDERR_BIN, O_WRONLY | O_CREAT | O_APPEND);
+    int stderr_idx = open_or_die(STDERR_IDX, O_WRONLY | O_CREAT | O_APPEND);
+    int stats_fd = open_or_die(STATS, O_WRONLY | O_CREAT | O_APPEND);
+
+    struct sigaction action;
+    memset(&action, 0, sizeof(action));
+    action.sa_handler = on_alarm;
+    sigaction(SIGALRM, &action, NULL);
+
+    for (long i = 0; i < n_tests; i++) {
+        long long in_offset, in_length;
+        if (fscanf(inputs_idx, "%lld %lld", &in_offset, &in_length) != 2
+                || in_offset < 0 || in_length < 0 || in_offset + in_length > inputs_size) {
+            fprintf(stderr, "harness: bad input index of test %ld\n", i);
+            return 2;
+        }
+        int input_fd = open_or_die(INPUT, O_RDWR | O_CREAT | O_TRUNC);
+        if (write_all(input_fd, inputs + in_offset, in_length) < 0) {
+            perror(INPUT);
+            return 2;
+        }
+        lseek(input_fd, 0, SEEK_SET);
+        int err_fd = open_or_die(STDERR, O_RDWR | O_CREAT | O_TRUNC);
+        unlink(OUTPUT);
+        off_t out_offset = file_size(outputs_fd);
+
+        struct redirect redirects[3] = {{input_fd, NULL, 0}, {outputs_fd, NULL, 0}, {err_fd, NULL, 0}};
+        struct timespec start;
+        clock_gettime(CLOCK_MONOTONIC, &start);
+        timed_out = 0;
+        child = spawn(command, redirects);
+        if (time_limit > 0) {
+            struct itimerval timer = {{0, 0}, {time_limit / 1000, (time_limit % 1000) * 1000}};
+            setitimer(ITIMER_REAL, &timer, NULL);
+        }
+        struct record r;
+        finish(child, start, 0, &r);
+        struct itimerval disarm = {{0, 0}, {0, 0}};
+        setitimer(ITIMER_REAL, &disarm, NULL);
+        if (timed_out)
+            r.verdict = "TL";
+        close(input_fd);
+        if (file_size(outputs_fd) == out_offset)
+            append_file(OUTPUT, outputs_fd);
+
+        char line[MAX_RECORD];
+        format_record(line, sizeof(line), &r);
+        dprintf(stats_fd, "%s\n", line);
+        save_stderr(err_fd, stderr_fd, stderr_idx);
+        close(err_fd);
+        dprintf(outputs_idx, "%lld %lld\n",
+                (long long)out_offset, (long long)(file_size(outputs_fd) - out_offset));
+    }
+    return 0;
+}
+
+/* returns -1 on failure */
+static int connect_unix(const char *path) {
+    int sock = socket(AF_UNIX, SOCK_STREAM, 0);
+    if (sock < 0)
+        return -1;
+    struct sockaddr_un address = {.sun_family = AF_UNIX};
+    strncpy(address.sun_path, path, sizeof(address.sun_path) - 1);
+    if (connect(sock, (struct sockaddr *)&address, sizeof(address)) < 0) {
+        close(sock);
+        return -1;
+    }
+    return sock;
+}
+
+static int connect_control(void) {
+    int sock = connect_unix(CONTROL_SOCKET);
+    if (sock < 0) {
+        perror(CONTROL_SOCKET);
+        exit(2);
+    }
+    return sock;
+}
+
+static int send_message(int sock, const char *message) {
+    char line[MAX_MESSAGE + 1];
+    int length = snprintf(line, sizeof(line), "%s\n", message);
+    return write_all(sock, line, length);
+}
+
+/*
+ * Reads the next line of the control connection into `message`
+ * returns 0 at the end of the connection
+ */
+static int receive_message(int sock, char *message) {
+    static char buffer[MAX_MESSAGE * 4];
+    static size_t buffered;
+    for (;;) {
+        char *end = memchr(buffer, '\n', buffered);
+        if (end != NULL) {
+            size_t length = end - buffer;
+            if (length >= MAX_MESSAGE)
+                length = MAX_MESSAGE - 1;
+            memcpy(message, buffer, length);
+            message[length] = '\0';
+            buffered -= end + 1 - buffer;
+            memmove(buffer, end + 1, buffered);
+            return 1;
+        }
+        if (buffered == sizeof(buffer)) {
+            fprintf(stderr, "harness: too long control message\n");
+            exit(2);
+        }
+        ssize_t received = read(sock, buffer + buffered, sizeof(buffer) - buffered);
+        if (received < 0 && errno == EINTR)
+            continue;
+        if (received <= 0)
+            return 0;
+        buffered += received;
+    }
+}
+
+/* the name of a channel file of a slot, without a slot the plain name */
+static void slot_path(char *buffer, size_t size, const char *path, const char *suffix, long slot) {
+    if (slot < 0)
+        snprintf(buffer, size, "%s%s", path, suffix);
+    else
+        snprintf(buffer, size, "%s-%ld%s", path, slot, suffix);
+}
+
+static void start_program(char **command, struct program *program, long test, const char *channel,
+                          long slot, char *answer, size_t answer_size) {
+    char prog_in[64], prog_out[64], prog_socket[64], stderr_path[64];
+    slot_path(prog_in, sizeof(prog_in), PROG_IN, "", slot);
+    slot_path(prog_out, sizeof(prog_out), PROG_OUT, "", slot);
+    slot_path(prog_socket, sizeof(prog_socket), PROG_SOCKET, ".sock", slot);
+    snprintf(stderr_path, sizeof(stderr_path), DATA_DIR "/stderr-%ld.txt", test);
+    struct redirect redirects[3] = {
+        {-1, prog_in, O_RDONLY},
+        {-1, prog_out, O_WRONLY},
+        {-1, stderr_path, O_WRONLY | O_CREAT | O_TRUNC},
+    };
+
+    int prog_sock = -1;
+    if (strcmp(channel, "socket") == 0) {
+        /* completes at once, the tester accepts it when the test starts */
+        prog_sock = connect_unix(prog_socket);
+        if (prog_sock < 0) {
+            snprintf(answer, answer_size, "error cannot connect %s", prog_socket);
+            return;
+        }
+        redirects[0].fd = redirects[1].fd = prog_sock;
+    } else if (strcmp(channel, "fifo") != 0) {
+        snprintf(answer, answer_size, "error unknown channel %s", channel);
+        return;
+    }
+
+    clock_gettime(CLOCK_MONOTONIC, &program->start);
+    program->pid = spawn(command, redirects);
+    program->test = test;
+    if (prog_sock >= 0)
+        close(prog_sock);
+    snprintf(answer, answer_size, "started %ld", test);
+}
+
+static int serve_interactive(char **command) {
+    int sock = connect_control();
+    send_message(sock, "ready");
+
+    char message[MAX_MESSAGE];
+    char answer[MAX_MESSAGE];
+    /* the programs running now by slot */
+    struct program programs[MAX_SLOTS] = {0};
+    while (receive_message(sock, message)) {
+        long test;
+        long slot = -1;
+        char channel[16] = "fifo";
+        if (sscanf(message, "next %ld %15s %ld", &test, channel, &slot) >= 1) {
+            if (slot >= MAX_SLOTS) {
+                snprintf(answer, sizeof(answer), "error too many slots");
+            } else {
+                struct program *program = &programs[slot < 0 ? 0 : slot];
+                if (program->pid) {
+                    kill(-program->pid, SIGKILL);
+                    waitpid(program->pid, NULL, 0);
+                    program->pid = 0;
+                }
+                start_program(command, program, test, channel, slot, answer, sizeof(answer));
+            }
+        } else if (sscanf(message, "stop %ld", &test) == 1) {
+            struct program *program = NULL;
+            for (int i = 0; i < MAX_SLOTS; i++)
+                if (programs[i].pid && programs[i].test == test)
+                    program = &programs[i];
+            if (program == NULL) {
+                snprintf(answer, sizeof(answer), "error not running %ld", test);
+            } else {
+                kill(-program->pid, SIGKILL);
+                struct record r;
+                finish(program->pid, program->start, 1, &r);
+                program->pid = 0;
+                char line[MAX_RECORD];
+                format_record(line, sizeof(line), &r);
+                snprintf(answer, sizeof(answer), "done %ld %s", test, line);
+            }
+        } else if (strcmp(message, "exit") == 0) {
+            break;
+        } else {
+            snprintf(answer, sizeof(answer), "error unknown message");
+        }
+        if (send_message(sock, answer) < 0)
+            break;
+    }
+    for (int i = 0; i < MAX_SLOTS; i++)
+        if (programs[i].pid)
+            kill(-programs[i].pid, SIGKILL);
+    return 0;
+}
+
+int main(int argc, char **argv) {
+    if (argc < 3) {
+        fprintf(stderr,
+                "usage: %s <number of tests> <command> [args...]\n"
+                "       %s -i <command> [args...]\n"
+                "       %s -c <message>\n",
+                argv[0], argv[0], argv[0]);
+        return 2;
+    }
+    time_limit = env_limit("TIME_LIMIT_MS");
+    memory_limit = env_limit("MEMORY_LIMIT_KB");
+
+    if (strcmp(argv[1], "-c") == 0) {
+        int sock = connect_control();
+        return send_message(sock, argv[2]) < 0 ? 2 : 0;
+    }
+    if (strcmp(argv[1], "-i") == 0)
+        return serve_interactive(argv + 2);
+    return run_tests(atol(argv[1]), argv + 2);
+}
@@ -1,26 +1,21 @@
-# $1 - a number of tests
-# $2 - a path to the source file
-# $3 - a name of the main class
+# $1 - a path to the source file
+# $2 - a name of the main class
 cd /work
-{
-    dotnet new console --framework "net6.0" -n main -o . > /dev/null
-    rm /work/Program.cs
-    cp /data/cs.csproj /work/main.csproj
-    cp "$2" /work/"$3".cs
-    dotnet build main.csproj --nologo -o build -v q
-} || {
-    echo CompilationError > /data/to_py
-    exit 1
-}
+if [ -d /prog/build ]
+then
+  cp -r /prog/build /work/build
+else
+  {
+      dotnet new console --framework "net6.0" -n main -o . > /dev/null
+      rm /work/Program.cs
+      cp /data/cs.csproj /work/main.csproj
+      cp "$1" /work/"$2".cs
+      dotnet build main.csproj --nologo -o build -v q &> /data/compile.txt
+  } || {
+      harness -c compilation-error
+      exit 1
+  }
+  cp -r /work/build /data/build
+fi
 
-echo Start > /data/to_py
-for i in $(seq 0 $(($1-1)))
-do
-   {
-     cat /data/to_cont > /dev/null
-     echo '<<<ARBUZ'"$i"'ARBUZ>>>'
-     ./build/main </data/prog_in >/data/prog_out &
-     cat /data/to_cont > /dev/null
-     kill $! 2> /dev/null || true
-   } || true
-done
+exec harness -i ./build/main
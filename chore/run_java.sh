@@ -4,15 +4,13 @@
 cd /work
 cp "$2" /work/"$3".java
 set -e
-javac /work/"$3".java &> /data/output0.txt
+if [ -d /prog/build ]
+then
+  cp /prog/build/*.class /work/
+else
+  javac /work/"$3".java &> /data/compile.txt
+  mkdir -p /data/build && cp /work/*.class /data/build/
+fi
 set +e
 JAVA_FLAGS=(-XX:+UseSerialGC '-XX:TieredStopAtLevel=1' '-XX:NewRatio=5' -Xms8M -Xmx256M -Xss64M '-DONLINE_JUDGE=true')
-for i in $(seq 0 $(($1-1)))
-do
-   {
-     ln -fs /data/input"$i".txt ./input.txt
-     ln -fs /data/output"$i".txt ./output.txt
-     rm -f /data/output"$i".txt
-     java "${JAVA_FLAGS[@]}" "$3" < /data/input"$i".txt >> ./output.txt 2>&1
-   } || true
-done
+harness "$1" java "${JAVA_FLAGS[@]}" "$3"
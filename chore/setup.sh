@@ -22,7 +22,7 @@ sudo docker plugin install grafana/loki-docker-driver:2.9.4 --alias loki --grant
 sudo bash chore/install_lang_images.sh
 
 sudo ln -s "$PWD" /usr/gigatester
-mkdir data prog queue reference
+mkdir jobs state reference cache
 cd tester || (echo "Run from the root"; exit)
 python3.11 -m venv venv
 source venv/bin/activate
@@ -0,0 +1,220 @@
+"""
+Seeded corpora of tests generated in advance, so submissions do not wait for generators.
+
+Usage (from the repository root):
+    python -m tester.bank build [task ...] [--size N] [--seed S] [--outputs]
+    python -m tester.bank list
+"""
+__all__ = ['TestBank', 'BANKS_DIR']
+
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import pathlib
+import pickle
+import random
+import shutil
+from typing import Any, Iterable
+import uuid
+
+from .bundle import Bundle, write_bundle
+from .interactive_task import InteractiveTask
+from .simple_task import SimpleTask
+
+
+BANKS_DIR = pathlib.Path('banks').absolute()
+
+
+def generator_fingerprint(task: SimpleTask | InteractiveTask) -> str:
+    """
+    Changes whenever the code of the generator changes, so outdated banks are not used
+    """
+    generator = task.generator if isinstance(task, SimpleTask) else task.env_generator
+    try:
+        source = inspect.getsource(type(generator))
+    except (OSError, TypeError):
+        source = type(generator).__qualname__
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+def seed_generators(seed: int):
+    random.seed(seed)
+    try:
+        import numpy
+        numpy.random.seed(seed % 2**32)
+    except ImportError:
+        pass
+
+
+class TestBank:
+    """
+    A versioned set of tests of a task: inputs for simple tasks, environments for interactive ones.
+    The `current` file of a task directory names the version in use.
+    """
+
+    def __init__(self, path: pathlib.Path, manifest: dict):
+        self.path = path
+        self.manifest = manifest
+        self.size: int = manifest['size']
+        self.interactive: bool = manifest['interactive']
+
+    @classmethod
+    def load(cls, task_id: str, task: SimpleTask | InteractiveTask, root: pathlib.Path = BANKS_DIR) -> "TestBank | None":
+        """
+        :return: the current bank of the task or None if there is no bank for the current generator
+        """
+        try:
+            version = (root / task_id / 'current').read_text().strip()
+            path = root / task_id / version
+            with open(path / 'manifest.json') as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if manifest['generator'] != generator_fingerprint(task):
+            return None
+        return cls(path, manifest)
+
+    @classmethod
+    def build(
+            cls,
+            task_id: str,
+            task: SimpleTask | InteractiveTask,
+            size: int,
+            seed: int,
+            root: pathlib.Path = BANKS_DIR,
+    ) -> "TestBank":
+        fingerprint = generator_fingerprint(task)
+        version = hashlib.sha256(f'{fingerprint}:{seed}:{size}'.encode()).hexdigest()[:16]
+        manifest = {
+            'task': task_id,
+            'version': version,
+            'seed': seed,
+            'size': size,
+            'generator': fingerprint,
+            'interactive': isinstance(task, InteractiveTask),
+        }
+
+        task_dir = root / task_id
+        tmp = task_dir / f'.tmp-{uuid.uuid4().hex}'
+        tmp.mkdir(parents=True)
+        seed_generators(seed)
+        if isinstance(task, SimpleTask):
+            write_bundle(tmp / 'inputs', (task.generator.generate() for _ in range(size)))
+        else:
+            with open(tmp / 'environments.pickle', 'wb') as f:
+                pickle.dump([task.env_generator.generate() for _ in range(size)], f)
+        with open(tmp / 'manifest.json', 'w') as f:
+            json.dump(manifest, f, indent=4)
+
+        path = task_dir / version
+        shutil.rmtree(path, ignore_errors=True)
+        os.rename(tmp, path)
+        current_tmp = task_dir / f'.current-{uuid.uuid4().hex}'
+        current_tmp.write_text(version)
+        os.replace(current_tmp, task_dir / 'current')
+        return cls(path, manifest)
+
+    def indices(self, n: int, seed: Any) -> list[int]:
+        rng = random.Random(seed)
+        if n <= self.size:
+            return rng.sample(range(self.size), n)
+        return rng.choices(range(self.size), k=n)
+
+    def draw(self, n: int, seed: Any) -> list[Any]:
+        """
+        Picks n tests, the same seed gives the same tests
+        """
+        return self.read(self.indices(n, seed))
+
+    def all(self) -> list[Any]:
+        return self.read(range(self.size))
+
+    def read(self, indices: Iterable[int]) -> list[Any]:
+        if self.interactive:
+            with open(self.path / 'environments.pickle', 'rb') as f:
+                environments = pickle.load(f)
+            return [environments[i] for i in indices]
+        with Bundle(self.path / 'inputs') as bundle:
+            return [bundle[i] for i in indices]
+
+
+def store_expected_outputs(task_id: str, task: SimpleTask, bank: TestBank):
+    from .container_pool import clear_dir, prepare_work_dir
+    from .reference_cache import ReferenceCache
+
+    cache = ReferenceCache.from_env()
+    work_dir = pathlib.Path('jobs/bank').absolute()
+    prepare_work_dir(work_dir)
+    tester = task.reference_tester(work_dir)
+    reference_hash = ReferenceCache.reference_hash(task.reference_file, tester)
+
+    tests = [t for t in bank.all() if cache.lookup(task_id, reference_hash, t) is None]
+    for start in range(0, len(tests), task.n_tests):
+        chunk = tests[start:start + task.n_tests]
+        clear_dir(work_dir / 'data')
+        write_bundle(work_dir / 'data' / 'inputs', chunk)
+        outputs = tester.start(len(chunk), task.reference_file, task.timeout)
+        for k, (test, output) in enumerate(zip(chunk, outputs)):
+            if (stats := tester.test_stats[k]) is not None and stats.verdict == 'OK':
+                cache.store(task_id, reference_hash, test, output)
+            else:
+                print(f'{task_id}: the reference program has failed on a test, its output is not cached')
+
+
+def store_reference_transcripts(task_id: str, task: InteractiveTask, bank: TestBank):
+    # needs the tester's environment (tester/.env)
+    from .container_pool import prepare_work_dir
+    from .main import run_reference_transcripts
+
+    work_dir = pathlib.Path('jobs/bank').absolute()
+    prepare_work_dir(work_dir)
+    tester = task.reference_tester(work_dir)
+    environments = bank.all()
+    for start in range(0, len(environments), task.n_tests):
+        # the cached ones are skipped
+        run_reference_transcripts(task, task_id, tester, environments[start:start + task.n_tests])
+
+
+def main():
+    from .tasks.task_dict import TASK_DICT
+
+    parser = argparse.ArgumentParser(prog='python -m tester.bank', description='Builds test banks')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help='(re)build banks of tasks')
+    build.add_argument('tasks', nargs='*', help='task ids, all tasks by default')
+    build.add_argument('--size', type=int, help='tests in a bank, 10 * n_tests by default')
+    build.add_argument('--seed', type=int, default=0)
+    build.add_argument('--outputs', action='store_true',
+                       help='run reference programs to cache expected outputs (simple tasks) '
+                            'or transcripts (interactive tasks)')
+    commands.add_parser('list', help='show current banks')
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        for task_id, task in TASK_DICT.items():
+            bank = TestBank.load(task_id, task)
+            if bank is None:
+                print(f'{task_id}: no bank or the generator has changed')
+            else:
+                print(f'{task_id}: version {bank.manifest["version"]}, '
+                      f'{bank.size} tests, seed {bank.manifest["seed"]}')
+        return
+
+    for task_id in args.tasks or list(TASK_DICT):
+        if task_id not in TASK_DICT:
+            parser.error(f'unknown task {task_id}')
+        task = TASK_DICT[task_id]
+        bank = TestBank.build(task_id, task, args.size or 10 * task.n_tests, args.seed)
+        print(f'{task_id}: built version {bank.manifest["version"]} with {bank.size} tests')
+        if args.outputs and isinstance(task, SimpleTask):
+            store_expected_outputs(task_id, task, bank)
+            print(f'{task_id}: expected outputs are cached')
+        elif args.outputs and isinstance(task, InteractiveTask):
+            store_reference_transcripts(task_id, task, bank)
+            print(f'{task_id}: reference transcripts are cached')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,311 @@
+"""
+Benchmarks of the interactive path with a local echo program (`cat`) in place of the container,
+so regressions of the host's side can be compared between commits.
+
+Usage (from the repository root, no docker daemon or `tester/.env` is needed):
+    python -m tester.bench [--messages N] [--tests N] [--flow-messages N] [--parallel K] [--output FILE]
+
+The results are JSON:
+    communicators - round trips of single messages: messages/s, latency percentiles in microseconds
+                    and the time to start the program and open the channel
+    workers       - the time to start and stop an interactor worker process
+    flow          - `run_interactive_program` on `tests` tests: the setup of a test without messages
+                    (control messages, the program, the channel, the worker's turn) and messages/s with them
+"""
+__all__ = ['LocalTester', 'run_benchmarks']
+
+import argparse
+from contextlib import contextmanager
+import json
+import os
+from pathlib import Path
+import platform
+import socket
+import statistics
+import subprocess
+import tempfile
+import time
+import typing
+from typing import Any, Callable, Iterator
+
+from .container_pool import clear_dir
+from .interactive_task import (
+    AbsCommunicator,
+    AbsEnvironmentGenerator,
+    AbsEnvironmentPresenter,
+    AbsLoggingInteractor,
+    AsyncAbsLoggingInteractor,
+    AsyncUnixSocketCommunicator,
+    InteractiveTask,
+    LoggingCommunicatorDecorator,
+    NamedPipeCommunicator,
+    UnixSocketCommunicator,
+)
+from .interactor_worker import InteractorWorker
+from .limits import TestStats
+from .interactive_run import run_interactive_program
+
+if typing.TYPE_CHECKING:
+    from .testers import AbsTester
+
+
+def start_echo(data: Path, channel: str, slot: int | None) -> subprocess.Popen:
+    """
+    Starts the echo program connected the way the harness connects a program (see chore/harness/harness.c)
+    """
+    suffix = f'-{slot}' if slot is not None else ''
+    if channel == 'socket':
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.connect(str(data / f'prog{suffix}.sock'))
+            return subprocess.Popen(['cat'], stdin=conn.fileno(), stdout=conn.fileno())
+    # the shell opens the fifos, so nothing here waits for the communicator
+    return subprocess.Popen(
+        ['sh', '-c', 'exec cat < "$0" > "$1"', data / f'prog_in{suffix}', data / f'prog_out{suffix}'],
+    )
+
+
+def serve_control(data: Path):
+    """
+    Plays the harness of an interactive run: serves the control channel `data/control.sock`
+    """
+    programs: dict[str, tuple[subprocess.Popen, float]] = {}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as control:
+        control.connect(str(data / 'control.sock'))
+        stream = control.makefile('rw')
+
+        def answer(*words: object):
+            stream.write(' '.join(map(str, words)) + '\n')
+            stream.flush()
+
+        answer('ready')
+        for line in stream:
+            match line.split():
+                case ['next', test, channel, slot]:
+                    program = start_echo(data, channel, None if slot == 'None' else int(slot))
+                    programs[test] = (program, time.perf_counter())
+                    answer('started', test)
+                case ['stop', test] if test in programs:
+                    program, started = programs.pop(test)
+                    program.kill()
+                    program.wait()
+                    wall_ms = int((time.perf_counter() - started) * 1000)
+                    answer('done', test, 'OK', 0, 0, wall_ms, 0, 0)
+                case ['exit']:
+                    break
+                case message:
+                    answer('error', 'unknown', *message)
+    for program, _ in programs.values():
+        program.kill()
+        program.wait()
+
+
+class LocalTester:
+    """
+    Stands in for `AbsTester` in `run_interactive_program`: no container, the harness is played by
+    `serve_control` and the program is an echo
+    """
+    start_timeout = 5
+
+    def __init__(self, work_dir: Path):
+        self.work_dir = work_dir
+        self.test_stats: list[TestStats | None] = []
+
+    @contextmanager
+    def runtime(self) -> Iterator["LocalTester"]:
+        yield self
+
+    def local(self, *p: str) -> Path:
+        return self.work_dir.joinpath(*p)
+
+    def start_interactive(self, timeout: int, file_name: os.PathLike[str]) -> str:
+        serve_control(self.local('data'))
+        return ''
+
+    def read_stderr(self, test: int) -> str:
+        return ''
+
+
+class EchoEnvironment(AbsEnvironmentGenerator, AbsEnvironmentPresenter):
+    """
+    The environment of an echo test is the number of messages, the runs get theirs explicitly
+    """
+
+    def generate(self) -> int:
+        return 0
+
+    def to_string(self, env: int) -> str:
+        return str(env)
+
+
+class EchoInteractor(AbsLoggingInteractor):
+    """
+    Sends `env` messages one by one and checks their echoes
+    """
+
+    def run_test(self, env: int) -> bool:
+        for k in range(env):
+            self.communicator.send(str(k))
+            if self.communicator.receive_line() != str(k):
+                return False
+        return True
+
+
+class AsyncEchoInteractor(AsyncAbsLoggingInteractor):
+    async def run_test(self, env: int) -> bool:
+        for k in range(env):
+            await self.communicator.send(str(k))
+            if await self.communicator.receive_line() != str(k):
+                return False
+        return True
+
+
+def percentiles(samples: list[float]) -> dict[str, float]:
+    if len(samples) < 2:
+        samples = samples * 2 or [0.0, 0.0]
+    cuts = statistics.quantiles(samples, n=100, method='inclusive')
+    return {
+        'p50': round(cuts[49], 1),
+        'p90': round(cuts[89], 1),
+        'p99': round(cuts[98], 1),
+        'max': round(max(samples), 1),
+    }
+
+
+def bench_communicator(communicator_type: type[AbsCommunicator], messages: int, log: bool) -> dict:
+    """
+    Round trips of single messages through a communicator, with `log` through the logging decorator
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        data = Path(tmp)
+        communicator = communicator_type(data, 0)
+        communicator.setup()
+        try:
+            session = LoggingCommunicatorDecorator(communicator) if log else communicator
+            started = time.perf_counter()
+            program = start_echo(data, communicator.channel, 0)
+            session.start()
+            start_ms = (time.perf_counter() - started) * 1000
+
+            latencies_us = []
+            began = time.perf_counter()
+            for k in range(messages):
+                sent = time.perf_counter_ns()
+                session.send(str(k))
+                if session.receive_line() != str(k):
+                    raise RuntimeError(f'{communicator_type.__name__} has lost message {k}')
+                latencies_us.append((time.perf_counter_ns() - sent) / 1000)
+            elapsed = time.perf_counter() - began
+
+            session.finish()
+            program.kill()
+            program.wait()
+        finally:
+            communicator.teardown()
+    return {
+        'messages': messages,
+        'messages_per_s': round(messages / elapsed),
+        'latency_us': percentiles(latencies_us),
+        'start_ms': round(start_ms, 2),
+    }
+
+
+def bench_worker(rounds: int) -> dict:
+    """
+    Starting and stopping of an interactor worker process
+    """
+    times_ms = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        worker = InteractorWorker(NamedPipeCommunicator(), EchoInteractor, [])
+        worker.start()
+        worker.close()
+        times_ms.append((time.perf_counter() - started) * 1000)
+    return {'rounds': rounds, 'start_stop_ms': percentiles(times_ms)}
+
+
+def bench_flow(
+        communicator_type: type,
+        interactor_factory: Callable[[Any], Any],
+        tests: int,
+        messages: int,
+        parallel: int,
+) -> dict:
+    """
+    The whole interactive run of `tests` tests: once without messages, once with `messages` in every test
+    """
+    environment = EchoEnvironment()
+    # no reference program is run
+    reference = ('bench', typing.cast('AbsTester', None))
+    task = InteractiveTask(
+        environment, interactor_factory, environment, reference, tests, 30,
+        communicator_type=communicator_type, parallel=parallel,
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        tester = LocalTester(Path(tmp))
+        tester.local('data').mkdir()
+        walls = []
+        for env in (0, messages):
+            clear_dir(tester.local('data'))
+            started = time.perf_counter()
+            results = run_interactive_program(tests, [env] * tests, task.one_timeout, task, tester, Path('bench'))
+            walls.append(time.perf_counter() - started)
+            if failed := [i for i, (success, _) in enumerate(results) if not success]:
+                raise RuntimeError(f'{communicator_type.__name__}: tests {failed} have failed')
+    empty, loaded = walls
+    return {
+        'tests': tests,
+        'parallel': parallel,
+        'messages_per_test': messages,
+        'empty_s': round(empty, 3),
+        'loaded_s': round(loaded, 3),
+        'setup_per_test_ms': round(empty / tests * 1000, 2),
+        'messages_per_s': round(tests * messages / loaded),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(messages: int, tests: int, flow_messages: int, parallel: int) -> dict:
+    communicators = {}
+    for name, communicator_type in (('fifo', NamedPipeCommunicator), ('socket', UnixSocketCommunicator)):
+        communicators[name] = bench_communicator(communicator_type, messages, log=False)
+        communicators[f'{name}+log'] = bench_communicator(communicator_type, messages, log=True)
+    flow = {
+        'fifo': bench_flow(NamedPipeCommunicator, EchoInteractor, tests, flow_messages, parallel),
+        'socket': bench_flow(UnixSocketCommunicator, EchoInteractor, tests, flow_messages, parallel),
+        'async-socket': bench_flow(AsyncUnixSocketCommunicator, AsyncEchoInteractor, tests, flow_messages, parallel),
+    }
+    return {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'communicators': communicators,
+        'workers': bench_worker(tests),
+        'flow': flow,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m tester.bench', description='Benchmarks the interactive path')
+    parser.add_argument('--messages', type=int, default=10000, help='round trips through every communicator')
+    parser.add_argument('--tests', type=int, default=20, help='tests of an interactive run')
+    parser.add_argument('--flow-messages', type=int, default=100, help='round trips in a test of a run')
+    parser.add_argument('--parallel', type=int, default=1, help='tests of a run at the same time')
+    parser.add_argument('--output', type=Path, help='a file for the results instead of stdout')
+    args = parser.parse_args()
+
+    results = json.dumps(run_benchmarks(args.messages, args.tests, args.flow_messages, args.parallel), indent=2)
+    if args.output is None:
+        print(results)
+    else:
+        args.output.write_text(results + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+__all__ = ['BuildCache', 'SizeCap']
+
+import hashlib
+import os
+from pathlib import Path
+import shutil
+from typing import Callable, Iterable, Iterator
+import uuid
+
+
+class SizeCap:
+    """
+    Keeps a cache on the host within `max_bytes` for several worker processes.
+    Every process counts what it adds; only when its count goes over the cap the cache is scanned,
+    with what the other processes have added, and the least recently used entries are removed
+    down to 3/4 of the cap, so the scans are rare.
+    """
+
+    def __init__(
+            self,
+            max_bytes: int,
+            scan: Callable[[], Iterable[tuple[float, int, str]]],
+            remove: Callable[[str], None],
+    ):
+        """
+        :param scan: gives (mtime, size, path) of every entry
+        :param remove: removes an entry by its path
+        """
+        self.max_bytes = max_bytes
+        self.scan = scan
+        self.remove = remove
+        # None until the first addition, which scans
+        self.total: int | None = None
+
+    def added(self, size: int):
+        if self.total is not None:
+            self.total += size
+        if self.total is None or self.total > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        entries = sorted(self.scan())
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            for _, size, path in entries:
+                if total <= self.max_bytes * 3 // 4:
+                    break
+                self.remove(path)
+                total -= size
+        self.total = total
+
+
+class BuildCache:
+    """
+    Compiled programs kept on the host by a hash of the source, the language and the build flags.
+    Entries are directories; the least recently used ones are evicted when the cache
+    grows over `max_bytes`. All the operations are safe for several worker processes.
+    """
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = root.absolute()
+        self.cap = SizeCap(max_bytes, self.scan, lambda path: shutil.rmtree(path, ignore_errors=True))
+
+    @staticmethod
+    def key(*parts: str | bytes) -> str:
+        h = hashlib.sha256()
+        for part in parts:
+            if isinstance(part, str):
+                part = part.encode()
+            # length prefix to keep ('ab', 'c') and ('a', 'bc') apart
+            h.update(len(part).to_bytes(8, 'little'))
+            h.update(part)
+        return h.hexdigest()
+
+    def entry(self, key: str) -> Path:
+        return self.root / key
+
+    def restore(self, key: str, destination: Path) -> bool:
+        """
+        Hard links the cached build into `destination`
+        :return: whether the build was found
+        """
+        entry = self.entry(key)
+        if not entry.is_dir():
+            return False
+        try:
+            shutil.copytree(entry, destination, copy_function=os.link)
+            # mark as recently used
+            os.utime(entry)
+        except OSError:
+            # evicted in the meantime
+            shutil.rmtree(destination, ignore_errors=True)
+            return False
+        return True
+
+    def store(self, key: str, build: Path):
+        """
+        Moves a fresh build into the cache
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        entry = self.entry(key)
+        tmp = self.root / f'.tmp-{uuid.uuid4().hex}'
+        shutil.move(build, tmp)
+        try:
+            os.rename(tmp, entry)
+        except OSError:
+            # the same program has been stored by another worker
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        self.cap.added(self.size(entry))
+
+    @staticmethod
+    def size(path: Path | str) -> int:
+        total = 0
+        for dir_path, _, files in os.walk(path):
+            for f in files:
+                try:
+                    total += os.path.getsize(os.path.join(dir_path, f))
+                except FileNotFoundError:
+                    pass
+        return total
+
+    def scan(self) -> Iterator[tuple[float, int, str]]:
+        for entry in os.scandir(self.root):
+            if entry.name.startswith('.tmp-'):
+                continue
+            try:
+                mtime = entry.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            yield mtime, self.size(entry.path), entry.path
@@ -0,0 +1,77 @@
+"""
+A bundle keeps many small texts in two files instead of a file per text:
+`<name>.bin` - the texts one after another,
+`<name>.idx` - a line `<offset> <length>` (in bytes) for every text.
+The text index can be read by bash and the in-container scripts append to it test by test.
+"""
+__all__ = ['Bundle', 'write_bundle', 'read_bundle']
+
+import mmap
+import os
+from pathlib import Path
+from typing import Iterable
+
+
+def bundle_paths(prefix: os.PathLike) -> tuple[Path, Path]:
+    prefix = Path(prefix)
+    return prefix.with_name(prefix.name + '.bin'), prefix.with_name(prefix.name + '.idx')
+
+
+def write_bundle(prefix: os.PathLike, items: Iterable[str]):
+    bin_path, idx_path = bundle_paths(prefix)
+    offset = 0
+    index = []
+    with open(bin_path, 'wb') as blob:
+        for item in items:
+            data = item.encode()
+            blob.write(data)
+            index.append(f'{offset} {len(data)}\n')
+            offset += len(data)
+    with open(idx_path, 'w') as f:
+        f.writelines(index)
+
+
+class Bundle:
+    """
+    Random access to the texts of a bundle through mmap.
+    Only complete lines of the index are taken, so a bundle which is still being written can be read.
+    """
+
+    def __init__(self, prefix: os.PathLike):
+        bin_path, idx_path = bundle_paths(prefix)
+        with open(idx_path, 'rb') as f:
+            raw_index = f.read()
+        self.index: list[tuple[int, int]] = []
+        for line in raw_index.split(b'\n')[:-1]:
+            offset, length = line.split()
+            self.index.append((int(offset), int(length)))
+
+        self.map: mmap.mmap | None = None
+        with open(bin_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size > 0:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __getitem__(self, i: int) -> str:
+        offset, length = self.index[i]
+        if self.map is None or length == 0:
+            return ''
+        return self.map[offset:offset + length].decode(errors='replace')
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+
+    def __enter__(self) -> "Bundle":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+def read_bundle(prefix: os.PathLike) -> list[str]:
+    with Bundle(prefix) as bundle:
+        return [bundle[i] for i in range(len(bundle))]
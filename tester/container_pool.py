@@ -0,0 +1,122 @@
+__all__ = ['ContainerPool', 'WarmContainer', 'clear_dir']
+
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import itertools
+import os
+from pathlib import Path
+import queue
+import shutil
+from typing import Iterable
+
+import docker
+import docker.errors
+from docker.models.containers import Container
+
+
+POOL_LABEL = 'gigatester.pool'
+# keeps the container alive without doing anything; works in busybox images too
+IDLE_COMMAND = 'tail -f /dev/null'
+
+
+def clear_dir(path: Path):
+    """
+    Removes the contents of a directory but keeps the directory itself,
+    so the bind mounts of running containers stay valid
+    """
+    for entry in os.scandir(path):
+        if entry.is_dir(follow_symlinks=False):
+            shutil.rmtree(entry.path, ignore_errors=True)
+        else:
+            os.remove(entry.path)
+
+
+def prepare_work_dir(work_dir: Path):
+    """
+    Empty `data` and `prog` of a job
+    """
+    for d in ('data', 'prog'):
+        shutil.rmtree(work_dir / d, ignore_errors=True)
+        (work_dir / d).mkdir(parents=True)
+
+
+class WarmContainer:
+    def __init__(self, image: str, container: Container, lane: Path):
+        self.image = image
+        self.container = container
+        # a private directory with `prog` and `data` mounted into the container
+        self.lane = lane
+
+
+class ContainerPool:
+    """
+    Keeps `size` idle network-less containers of every image started in advance.
+    A container is used for a single run and then replaced in the background,
+    so the container startup is not on the critical path of a submission.
+    """
+
+    def __init__(self, docker_engine: docker.DockerClient, root: Path, size: int):
+        self.docker = docker_engine
+        self.root = root.absolute()
+        self.size = size
+        self.idle: defaultdict[str, queue.SimpleQueue[WarmContainer]] = defaultdict(queue.SimpleQueue)
+        self.lanes = itertools.count()
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='container-pool')
+        self.remove_stale()
+
+    def remove_stale(self):
+        # containers left by a killed worker
+        stale = self.docker.containers.list(all=True, filters={'label': f'{POOL_LABEL}={self.root}'})
+        for container in stale:
+            try:
+                container.remove(force=True)
+            except docker.errors.NotFound:
+                pass
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def create(self, image: str) -> WarmContainer:
+        lane = self.root / str(next(self.lanes))
+        (lane / 'prog').mkdir(parents=True)
+        (lane / 'data').mkdir()
+        container = self.docker.containers.run(
+            image,
+            detach=True, network_mode='none', working_dir='/work',
+            volumes=[f'{lane / "prog"}:/prog:ro',
+                     f'{lane / "data"}:/data'],
+            labels={POOL_LABEL: str(self.root)},
+            command=IDLE_COMMAND,
+        )
+        return WarmContainer(image, container, lane)
+
+    def fill(self, images: Iterable[str]):
+        for image in images:
+            for _ in range(self.size - self.idle[image].qsize()):
+                self.executor.submit(self._add, image)
+
+    def acquire(self, image: str) -> WarmContainer:
+        try:
+            return self.idle[image].get_nowait()
+        except queue.Empty:
+            # the pool is exhausted, start a container right now
+            return self.create(image)
+
+    def release(self, warm: WarmContainer):
+        self.executor.submit(self._recycle, warm)
+
+    def _add(self, image: str):
+        try:
+            self.idle[image].put(self.create(image))
+        except docker.errors.DockerException:
+            # acquire() will start a container itself and report the error
+            pass
+
+    def _recycle(self, warm: WarmContainer):
+        # a used container may keep garbage in /work or running processes,
+        # so it is never reused
+        try:
+            warm.container.remove(force=True)
+        except docker.errors.DockerException:
+            pass
+        shutil.rmtree(warm.lane, ignore_errors=True)
+        if self.idle[warm.image].qsize() < self.size:
+            self._add(warm.image)
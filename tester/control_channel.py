@@ -0,0 +1,83 @@
+__all__ = ['ControlChannel']
+
+import os
+from pathlib import Path
+import socket
+import threading
+import time
+
+from .exceptions import MyContainerError, MyTimeoutError
+
+
+class ControlChannel:
+    """
+    The tester's end of the connection with the harness of an interactive run
+    (see chore/harness/harness.c). The harness connects to a Unix socket
+    in the shared `data` directory once and keeps the connection for the whole run.
+    Messages are lines of space-separated words.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(str(path))
+        # the harness may run as another user
+        os.chmod(path, 0o777)
+        self.server.listen(1)
+        self.conn: socket.socket | None = None
+        self.buffer = b''
+        # requests of parallel tests
+        self.lock = threading.Lock()
+
+    def accept(self, timeout: float):
+        self.server.settimeout(timeout)
+        try:
+            self.conn, _ = self.server.accept()
+        except socket.timeout:
+            raise MyTimeoutError()
+
+    def send(self, *words: object):
+        if self.conn is None:
+            raise RuntimeError("Accept the harness first")
+        self.conn.sendall((' '.join(map(str, words)) + '\n').encode())
+
+    def receive(self, timeout: float) -> list[str]:
+        if self.conn is None:
+            raise RuntimeError("Accept the harness first")
+        deadline = time.monotonic() + timeout
+        while b'\n' not in self.buffer:
+            self.conn.settimeout(max(deadline - time.monotonic(), 0.001))
+            try:
+                chunk = self.conn.recv(4096)
+            except socket.timeout:
+                raise MyTimeoutError()
+            if not chunk:
+                raise MyContainerError("The harness has disconnected")
+            self.buffer += chunk
+        line, self.buffer = self.buffer.split(b'\n', 1)
+        return line.decode().split()
+
+    def request(self, timeout: float, *words: object) -> list[str]:
+        """
+        Sends a message and waits for the answer, an answer `error ...` is raised.
+        Safe to call from several threads.
+        """
+        with self.lock:
+            self.send(*words)
+            answer = self.receive(timeout)
+        if not answer or answer[0] == 'error':
+            raise MyContainerError(' '.join(answer))
+        return answer
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+        self.server.close()
+        self.path.unlink(missing_ok=True)
+
+    def __enter__(self) -> "ControlChannel":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
@@ -0,0 +1,165 @@
+"""
+Interactive runs: the interactors talk to the program while the harness in the container
+starts and stops it by the control channel (see chore/harness/harness.c).
+Free of the tester's configuration, so tester/bench.py runs it without docker.
+"""
+__all__ = ['InteractiveRunner', 'run_interactive_program']
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AbstractContextManager, ExitStack
+import logging
+import os
+import pathlib
+import threading
+import typing
+from typing import Any, Callable, Protocol, Self
+
+from .container_pool import clear_dir
+from .control_channel import ControlChannel
+from .exceptions import MyContainerError, MyException, MyTimeoutError
+from .interactive_task import (
+    AbsCommunicator,
+    AbsInteractor,
+    AsyncAbsCommunicator,
+    AsyncAbsInteractor,
+    InteractiveTask,
+)
+from .interactor_loop import run_async_sessions
+from .interactor_worker import InteractorWorker
+from .limits import TestStats
+
+
+# seconds for the harness to answer a control message
+CONTROL_TIMEOUT = 5
+logger = logging.getLogger('tester')
+
+
+class InteractiveRunner(Protocol):
+    """
+    What `run_interactive_program` needs of a tester: `AbsTester` or a stand-in (see tester/bench.py)
+    """
+    start_timeout: int
+    test_stats: list[TestStats | None]
+
+    def runtime(self) -> AbstractContextManager[Self]: ...
+
+    def local(self, *p: str) -> pathlib.Path: ...
+
+    def start_interactive(self, timeout: int, file_name: os.PathLike[str]) -> str: ...
+
+    def read_stderr(self, test: int) -> str: ...
+
+
+def run_interactive_program(
+        n_tests: int,
+        environments: list[Any],
+        one_timeout: int,
+        task: InteractiveTask,
+        tester: InteractiveRunner,
+        file: os.PathLike,
+) -> list[tuple[bool, str]]:
+    with tester.runtime() as tester:
+        data = tester.local('data')
+        clear_dir(data)
+        tester.test_stats[:] = [None] * len(environments)
+        # every slot runs its tests with its own communicator and interactor worker
+        parallel = max(1, min(task.parallel, len(environments)))
+        communicators = [task.communicator_type(data, slot) for slot in range(parallel)]
+        # async interactors run in this process
+        workers = [] if task.is_async else [
+            InteractorWorker(
+                typing.cast(AbsCommunicator, communicator),
+                typing.cast(Callable[[AbsCommunicator], AbsInteractor], task.interactor_factory),
+                environments,
+                task.max_log_bytes,
+            )
+            for communicator in communicators
+        ]
+
+        start_timeout = tester.start_timeout
+        with ControlChannel(data / 'control.sock') as control, ExitStack() as stack:
+            for communicator in communicators:
+                communicator.setup()
+                stack.callback(communicator.teardown)
+            for worker in workers:
+                stack.enter_context(worker)
+                worker.start()
+            # a thread: a process forked here would inherit the connections and the locks
+            # of the container pool's threads, which may be busy with the previous stage
+            container_manager = threading.Thread(
+                target=tester.start_interactive,
+                args=(start_timeout + int(one_timeout * 1.3 * n_tests), file),
+                daemon=True,
+            )
+            container_manager.start()
+            try:
+                try:
+                    control.accept(start_timeout)
+                    message = control.receive(start_timeout)
+                except MyTimeoutError:
+                    raise RuntimeError('Container has not started')
+                if message == ['compilation-error']:
+                    compile_log = (data / 'compile.txt').read_text(errors='replace')
+                    return [(False, compile_log)] * n_tests
+                elif message != ['ready']:
+                    raise MyContainerError(' '.join(message))
+
+                error = False  # container suddenly has stopped
+
+                def start_program(i: int, communicator: AbsCommunicator | AsyncAbsCommunicator) -> bool:
+                    nonlocal error
+                    if error:
+                        return False
+                    try:
+                        control.request(CONTROL_TIMEOUT, 'next', i, communicator.channel, communicator.slot)
+                    except (OSError, MyException):
+                        error = True
+                    return not error
+
+                def stop_program(i: int):
+                    nonlocal error
+                    try:
+                        record = control.request(CONTROL_TIMEOUT, 'stop', i)[2:]
+                        tester.test_stats[i] = TestStats.parse(' '.join(record))
+                    except (OSError, MyException):
+                        error = True
+                    except ValueError as e:
+                        # the test has been stopped, it is only left without stats
+                        logger.error(f"Test {i}: {e}")
+
+                if task.is_async:
+                    results = run_async_sessions(
+                        typing.cast(list[AsyncAbsCommunicator], communicators),
+                        typing.cast(Callable[[AsyncAbsCommunicator], AsyncAbsInteractor], task.interactor_factory),
+                        environments, one_timeout, task.max_log_bytes,
+                        start_program, stop_program,
+                    )
+                else:
+                    results = [(False, "Error")] * len(environments)
+                    tests = iter(range(len(environments)))
+                    tests_lock = threading.Lock()
+
+                    def run_slot(slot: int):
+                        communicator, worker = communicators[slot], workers[slot]
+                        while True:
+                            with tests_lock:
+                                i = next(tests, None)
+                            if i is None or not start_program(i, communicator):
+                                return
+                            results[i] = worker.run_test(i, one_timeout, lambda: stop_program(i))
+
+                    with ThreadPoolExecutor(max_workers=parallel) as executor:
+                        list(executor.map(run_slot, range(parallel)))
+                try:
+                    control.send('exit')
+                except OSError:
+                    pass
+
+                # runtime errors etc.
+                for i, (success, log) in enumerate(results):
+                    if stderr := tester.read_stderr(i).strip():
+                        results[i] = (success, log + stderr + '\n\n')
+                return results
+
+            finally:
+                container_manager.join()
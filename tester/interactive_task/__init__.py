@@ -4,7 +4,16 @@ from .abs_interactor import (
     AbsLoggingInteractor,
     LoggingCommunicatorDecorator,
     NamedPipeCommunicator,
+    UnixSocketCommunicator,
+)
+from .async_interactor import (
+    AsyncAbsCommunicator,
+    AsyncAbsInteractor,
+    AsyncAbsLoggingInteractor,
+    AsyncLoggingCommunicatorDecorator,
+    AsyncUnixSocketCommunicator,
 )
 from .environment import AbsEnvironmentGenerator, AbsEnvironmentPresenter
 from .task import InteractiveTask
+from .transcript import TRANSCRIPT_MAX_BYTES, TranscriptBuffer
 
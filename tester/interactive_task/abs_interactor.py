@@ -1,6 +1,7 @@
 __all__ = [
     "AbsCommunicator",
     "NamedPipeCommunicator",
+    "UnixSocketCommunicator",
     "AbsInteractor",
     "AbsLoggingInteractor",
     "LoggingCommunicatorDecorator"
@@ -9,14 +10,33 @@ __all__ = [
 from abc import ABC, abstractmethod
 from pathlib import Path
 import os
+import select
 import shutil
+import socket
 from typing import Any
 
+from .transcript import TRANSCRIPT_MAX_BYTES, TranscriptBuffer, TranscriptLogMixin
+
 
 class AbsCommunicator(ABC):
+    # how the harness connects the program with the communicator (see chore/harness/harness.c)
+    channel = 'fifo'
+    # tests of different slots run at the same time, each slot has its own files
+    slot: int | None = None
+
+    def __init__(self, workdir: str | os.PathLike = 'data', slot: int | None = None):
+        """
+        :param workdir: the host's side of the container's `/data`, where the channel files are made
+        :param slot: None for a run of one test at a time
+        """
+        self.slot = slot
+
     def setup(self):
         pass
 
+    def teardown(self):
+        pass
+
     @abstractmethod
     def start(self):
         pass
@@ -33,6 +53,13 @@ class AbsCommunicator(ABC):
     def send(self, message: str, append_newline = True) -> None:
         pass
 
+    def receive_lines(self, n: int, keep_newline: bool = False) -> list[str]:
+        return [self.receive_line(keep_newline) for _ in range(n)]
+
+    def send_lines(self, messages: list[str]) -> None:
+        for message in messages:
+            self.send(message)
+
     def __enter__(self):
         self.start()
 
@@ -41,10 +68,12 @@ class AbsCommunicator(ABC):
 
 
 class NamedPipeCommunicator(AbsCommunicator):
-    def __init__(self, workdir: str | os.PathLike = 'data'):
+    def __init__(self, workdir: str | os.PathLike = 'data', slot: int | None = None):
+        super().__init__(workdir, slot)
         workdir = Path(workdir)
-        self.prog_in_path = workdir / 'prog_in'
-        self.prog_out_path = workdir / 'prog_out'
+        suffix = f'-{slot}' if slot is not None else ''
+        self.prog_in_path = workdir / f'prog_in{suffix}'
+        self.prog_out_path = workdir / f'prog_out{suffix}'
         self.pipe = None
 
     def setup(self):
@@ -85,21 +114,133 @@ class NamedPipeCommunicator(AbsCommunicator):
         self.pipe[1].flush()
 
 
-class LoggingCommunicatorDecorator(AbsCommunicator):
-    def __init__(self, communicator: AbsCommunicator):
-        self.communicator = communicator
-        self.log = ""
+class SocketListenerMixin:
+    """
+    The listening socket `socket_path` which the harness connects the program to,
+    for the sync and async socket communicators
+    """
+    socket_path: Path
+    server: socket.socket | None
 
-    def append_log(self, s: str):
-        self.log += s
-        if s and s[-1] != '\n':
-            self.log += '\n'
+    def setup(self):
+        self.socket_path.unlink(missing_ok=True)
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(str(self.socket_path))
+        os.chmod(self.socket_path, 0o777)
+        self.server.listen(8)
+
+    def teardown(self):
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+        self.socket_path.unlink(missing_ok=True)
+
+
+class UnixSocketCommunicator(SocketListenerMixin, AbsCommunicator):
+    """
+    Talks to the program over a Unix socket connected to both its stdin and stdout.
+    Sent messages are buffered until the next receive, so a batch of queries costs a few syscalls.
+    While a batch is being sent the answers are read in, so the program never blocks on its output.
+    """
+    channel = 'socket'
+    # bytes of sent messages after which they are flushed anyway
+    SEND_BUFFER = 2**16
+    RECEIVE_CHUNK = 2**16
+
+    def __init__(self, workdir: str | os.PathLike = 'data', slot: int | None = None):
+        super().__init__(workdir, slot)
+        suffix = f'-{slot}' if slot is not None else ''
+        self.socket_path = Path(workdir) / f'prog{suffix}.sock'
+        self.server: socket.socket | None = None
+        self.conn: socket.socket | None = None
+        self.pending: list[bytes] = []
+        self.pending_size = 0
+        self.received = bytearray()
+        self.eof = False
 
-    def get_log(self) -> str:
-        return self.log
+    def start(self):
+        if self.server is None:
+            raise RuntimeError("Setup the communicator first")
+        self.conn, _ = self.server.accept()
+        self.pending = []
+        self.pending_size = 0
+        self.received = bytearray()
+        self.eof = False
+
+    def finish(self):
+        if self.conn is None:
+            raise RuntimeError("Start session first")
+        try:
+            self.flush()
+        except OSError:
+            pass
+        finally:
+            self.conn.close()
+            self.conn = None
+
+    def read_more(self):
+        assert self.conn is not None
+        chunk = self.conn.recv(self.RECEIVE_CHUNK)
+        if chunk:
+            self.received += chunk
+        else:
+            self.eof = True
+
+    def flush(self):
+        if self.conn is None:
+            raise RuntimeError("Start session first")
+        data = memoryview(b''.join(self.pending))
+        self.pending = []
+        self.pending_size = 0
+        while data:
+            readable, writable, _ = select.select([] if self.eof else [self.conn], [self.conn], [])
+            if readable:
+                self.read_more()
+            if writable:
+                try:
+                    data = data[self.conn.send(data, socket.MSG_DONTWAIT):]
+                except BlockingIOError:
+                    pass
+
+    def receive_line(self, keep_newline: bool = False) -> str:
+        if self.conn is None:
+            raise RuntimeError("Start session first")
+        self.flush()
+        start = 0
+        while (end := self.received.find(b'\n', start)) == -1 and not self.eof:
+            start = len(self.received)
+            self.read_more()
+        if end == -1:
+            # the rest before the end of the stream
+            end = len(self.received) - 1
+        line = self.received[:end + 1].decode(errors='replace')
+        del self.received[:end + 1]
+        if not keep_newline and line and line[-1] == '\n':
+            line = line[:-1]
+        return line
+
+    def send(self, message: str, append_newline = True) -> None:
+        if self.conn is None:
+            raise RuntimeError("Start session first")
+        if append_newline and (not message or message[-1] != '\n'):
+            message += '\n'
+        data = message.encode()
+        self.pending.append(data)
+        self.pending_size += len(data)
+        if self.pending_size >= self.SEND_BUFFER:
+            self.flush()
+
+    def send_lines(self, messages: list[str]) -> None:
+        self.send(''.join(m if m.endswith('\n') else m + '\n' for m in messages), append_newline=False)
 
-    def reset(self):
-        self.log = ""
+
+class LoggingCommunicatorDecorator(TranscriptLogMixin, AbsCommunicator):
+    def __init__(self, communicator: AbsCommunicator, max_log_bytes: int | None = TRANSCRIPT_MAX_BYTES):
+        """
+        :param max_log_bytes: the log keeps its beginning and its end within this size, None for no limit
+        """
+        self.communicator = communicator
+        self.log = TranscriptBuffer(max_log_bytes)
 
     def start(self):
         self.reset()
@@ -117,6 +258,17 @@ class LoggingCommunicatorDecorator(AbsCommunicator):
         self.communicator.send(message, append_newline)
         self.append_log(message)
 
+    def receive_lines(self, n: int, keep_newline: bool = False) -> list[str]:
+        messages = self.communicator.receive_lines(n, keep_newline)
+        for message in messages:
+            self.append_log(message)
+        return messages
+
+    def send_lines(self, messages: list[str]) -> None:
+        self.communicator.send_lines(messages)
+        for message in messages:
+            self.append_log(message)
+
 
 class AbsInteractor(ABC):
     def __init__(self, communicator: AbsCommunicator):
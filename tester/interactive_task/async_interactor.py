@@ -0,0 +1,200 @@
+__all__ = [
+    "AsyncAbsCommunicator",
+    "AsyncUnixSocketCommunicator",
+    "AsyncAbsInteractor",
+    "AsyncAbsLoggingInteractor",
+    "AsyncLoggingCommunicatorDecorator",
+]
+
+from abc import ABC, abstractmethod
+import asyncio
+import os
+from pathlib import Path
+import socket
+from typing import Any
+
+from .abs_interactor import SocketListenerMixin
+from .transcript import TRANSCRIPT_MAX_BYTES, TranscriptBuffer, TranscriptLogMixin
+
+
+class AsyncAbsCommunicator(ABC):
+    """
+    An awaitable communicator. Interactors of a task with such a communicator
+    are run by an event loop, many sessions in one process (see tester/interactor_loop.py).
+    """
+    # how the harness connects the program with the communicator (see chore/harness/harness.c)
+    channel = 'socket'
+    # tests of different slots run at the same time, each slot has its own files
+    slot: int | None = None
+
+    def __init__(self, workdir: str | os.PathLike = 'data', slot: int | None = None):
+        """
+        :param workdir: the host's side of the container's `/data`, where the channel files are made
+        :param slot: None for a run of one test at a time
+        """
+        self.slot = slot
+
+    def setup(self):
+        pass
+
+    def teardown(self):
+        pass
+
+    @abstractmethod
+    async def start(self):
+        pass
+
+    @abstractmethod
+    async def finish(self):
+        pass
+
+    @abstractmethod
+    async def receive_line(self, keep_newline: bool = False) -> str:
+        pass
+
+    @abstractmethod
+    async def send(self, message: str, append_newline = True) -> None:
+        pass
+
+    async def receive_lines(self, n: int, keep_newline: bool = False) -> list[str]:
+        return [await self.receive_line(keep_newline) for _ in range(n)]
+
+    async def send_lines(self, messages: list[str]) -> None:
+        for message in messages:
+            await self.send(message)
+
+    async def __aenter__(self):
+        await self.start()
+
+    async def __aexit__(self, *_):
+        await self.finish()
+
+
+class AsyncUnixSocketCommunicator(SocketListenerMixin, AsyncAbsCommunicator):
+    """
+    Talks to the program over a Unix socket connected to both its stdin and stdout.
+    Sending never waits: the event loop writes the data out while the answers are awaited.
+    """
+    # the longest line which can be received
+    LINE_LIMIT = 2**20
+
+    def __init__(self, workdir: str | os.PathLike = 'data', slot: int | None = None):
+        super().__init__(workdir, slot)
+        suffix = f'-{slot}' if slot is not None else ''
+        self.socket_path = Path(workdir) / f'prog{suffix}.sock'
+        self.server: socket.socket | None = None
+        self.reader: asyncio.StreamReader | None = None
+        self.writer: asyncio.StreamWriter | None = None
+
+    def setup(self):
+        super().setup()
+        assert self.server is not None
+        # accepted by the event loop
+        self.server.setblocking(False)
+
+    async def start(self):
+        if self.server is None:
+            raise RuntimeError("Setup the communicator first")
+        conn, _ = await asyncio.get_running_loop().sock_accept(self.server)
+        self.reader, self.writer = await asyncio.open_unix_connection(sock=conn, limit=self.LINE_LIMIT)
+
+    async def finish(self):
+        if self.writer is None:
+            raise RuntimeError("Start session first")
+        writer = self.writer
+        self.reader = None
+        self.writer = None
+        writer.close()
+        try:
+            await asyncio.wait_for(writer.wait_closed(), 1)
+        except (OSError, TimeoutError):
+            pass
+
+    async def receive_line(self, keep_newline: bool = False) -> str:
+        if self.reader is None:
+            raise RuntimeError("Start session first")
+        line = (await self.reader.readline()).decode(errors='replace')
+        if not keep_newline and line and line[-1] == '\n':
+            line = line[:-1]
+        return line
+
+    async def send(self, message: str, append_newline = True) -> None:
+        if self.writer is None:
+            raise RuntimeError("Start session first")
+        if append_newline and (not message or message[-1] != '\n'):
+            message += '\n'
+        self.writer.write(message.encode())
+
+    async def send_lines(self, messages: list[str]) -> None:
+        await self.send(''.join(m if m.endswith('\n') else m + '\n' for m in messages), append_newline=False)
+
+
+class AsyncLoggingCommunicatorDecorator(TranscriptLogMixin, AsyncAbsCommunicator):
+    def __init__(self, communicator: AsyncAbsCommunicator, max_log_bytes: int | None = TRANSCRIPT_MAX_BYTES):
+        """
+        :param max_log_bytes: the log keeps its beginning and its end within this size, None for no limit
+        """
+        self.communicator = communicator
+        self.log = TranscriptBuffer(max_log_bytes)
+
+    async def start(self):
+        self.reset()
+        await self.communicator.start()
+
+    async def finish(self):
+        await self.communicator.finish()
+
+    async def receive_line(self, keep_newline: bool = False) -> str:
+        message = await self.communicator.receive_line(keep_newline)
+        self.append_log(message)
+        return message
+
+    async def send(self, message: str, append_newline = True) -> None:
+        await self.communicator.send(message, append_newline)
+        self.append_log(message)
+
+    async def receive_lines(self, n: int, keep_newline: bool = False) -> list[str]:
+        messages = await self.communicator.receive_lines(n, keep_newline)
+        for message in messages:
+            self.append_log(message)
+        return messages
+
+    async def send_lines(self, messages: list[str]) -> None:
+        await self.communicator.send_lines(messages)
+        for message in messages:
+            self.append_log(message)
+
+
+class AsyncAbsInteractor(ABC):
+    def __init__(self, communicator: AsyncAbsCommunicator):
+        self.communicator = communicator
+
+    @abstractmethod
+    async def run(self, env: Any) -> bool:
+        """
+        :param env: any start data
+        :return: success
+        """
+        pass
+
+    @abstractmethod
+    def get_log(self) -> str:
+        pass
+
+
+class AsyncAbsLoggingInteractor(AsyncAbsInteractor):
+    def __init__(self, communicator: AsyncAbsCommunicator):
+        logger = AsyncLoggingCommunicatorDecorator(communicator)
+        super().__init__(logger)
+        self.logger = logger
+
+    @abstractmethod
+    async def run_test(self, env: Any) -> bool:
+        pass
+
+    async def run(self, env: Any) -> bool:
+        async with self.communicator:
+            return await self.run_test(env)
+
+    def get_log(self) -> str:
+        return self.logger.get_log()
@@ -1,25 +1,57 @@
-from typing import Any, Callable
+import typing
+from typing import Any, Callable, Sequence
+
 from ..tasks.task_base import TaskBase
-from .abs_interactor import AbsCommunicator, AbsInteractor
+from .abs_interactor import AbsCommunicator, AbsInteractor, NamedPipeCommunicator
+from .async_interactor import AsyncAbsCommunicator, AsyncAbsInteractor
 from .environment import AbsEnvironmentGenerator, AbsEnvironmentPresenter
-from ..testers import AbsTester
+from .transcript import TRANSCRIPT_MAX_BYTES
+
+if typing.TYPE_CHECKING:
+    from ..testers import AbsTester
+
+# the most tests of a run at the same time, as MAX_SLOTS in chore/harness/harness.c
+MAX_SLOTS = 64
 
 
 class InteractiveTask(TaskBase):
     def __init__(
             self,
             env_generator: "AbsEnvironmentGenerator",
-            interactor_factory: Callable[["AbsCommunicator"], "AbsInteractor"],
+            interactor_factory: Callable[["AbsCommunicator"], "AbsInteractor"]
+                                | Callable[["AsyncAbsCommunicator"], "AsyncAbsInteractor"],
             env_presenter: "AbsEnvironmentPresenter",
             reference: tuple[str, "AbsTester"],
             n_tests: int,
             one_timeout: int,
+            max_log_bytes: int | None = TRANSCRIPT_MAX_BYTES,
+            communicator_type: type["AbsCommunicator"] | type["AsyncAbsCommunicator"] = NamedPipeCommunicator,
+            parallel: int = 1,
+            escalation: Sequence[int] = (1,),
     ):
-        super().__init__(reference, n_tests)
+        """
+        :param max_log_bytes: a cap of the interaction log of a test, None for no limit
+        :param communicator_type: how the interactor talks to the program,
+            `UnixSocketCommunicator` suits tasks with many queries,
+            with `AsyncUnixSocketCommunicator` the factory makes `AsyncAbsInteractor`s
+            which are run by one event loop
+        :param parallel: the number of tests run at the same time, up to `MAX_SLOTS`
+        :param escalation: the numbers of tests run before the full set (see `TaskBase`)
+        """
+        if not 1 <= parallel <= MAX_SLOTS:
+            raise ValueError(f'parallel must be from 1 to {MAX_SLOTS}, got {parallel}')
+        super().__init__(reference, n_tests, escalation)
         self.env_generator = env_generator
         self.interactor_factory = interactor_factory
         self.env_presenter = env_presenter
         self.one_timeout = one_timeout
+        self.max_log_bytes = max_log_bytes
+        self.communicator_type = communicator_type
+        self.parallel = parallel
+
+    @property
+    def is_async(self) -> bool:
+        return issubclass(self.communicator_type, AsyncAbsCommunicator)
 
     def env_to_string(self, env: Any) -> str | None:
         return self.env_presenter.to_string(env) if self.env_presenter else None
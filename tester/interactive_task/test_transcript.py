@@ -0,0 +1,38 @@
+from .transcript import SKIP_MARK, TranscriptBuffer
+
+
+def test_no_limit_keeps_everything():
+    log = TranscriptBuffer(None)
+    for line in ('a\n', 'b' * 1000 + '\n', 'c\n'):
+        log.append(line)
+    assert log.getvalue() == 'a\n' + 'b' * 1000 + '\nc\n'
+
+
+def test_small_log_is_not_truncated():
+    log = TranscriptBuffer(40)
+    log.append('first\n')
+    log.append('second\n')
+    assert log.getvalue() == 'first\nsecond\n'
+
+
+def test_order_is_kept_after_the_head_overflows():
+    log = TranscriptBuffer(40)
+    for line in ('first line 123\n', 'second line is long\n', '7\n', 'last\n'):
+        log.append(line)
+    assert log.getvalue() == 'first line 123\n' + SKIP_MARK.format(20) + '7\nlast\n'
+
+
+def test_oversized_append_keeps_its_end():
+    log = TranscriptBuffer(10)
+    log.append('x' * 100)
+    assert log.getvalue() == SKIP_MARK.format(95) + 'x' * 5
+
+
+def test_clear_reopens_the_head():
+    log = TranscriptBuffer(20)
+    log.append('a' * 15)
+    log.append('b\n')
+    log.clear()
+    log.append('c\n')
+    log.append('d\n')
+    assert log.getvalue() == 'c\nd\n'
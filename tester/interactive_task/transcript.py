@@ -0,0 +1,86 @@
+from collections import deque
+import threading
+
+
+# the default cap of an interactive session log
+TRANSCRIPT_MAX_BYTES = 2**20
+SKIP_MARK = "\n... {} bytes skipped ...\n"
+
+
+class TranscriptBuffer:
+    """
+    An append-only log of a session bounded by `max_bytes`.
+    When the log grows over the cap its beginning and its end are kept
+    and the middle is dropped, so appending stays O(1) amortized.
+    """
+
+    def __init__(self, max_bytes: int | None = TRANSCRIPT_MAX_BYTES):
+        """
+        :param max_bytes: None for no limit
+        """
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()  # a watchdog may read the log during the session
+        self.head: list[str] = []
+        self.head_size = 0
+        self.tail: deque[tuple[str, int]] = deque()
+        self.tail_size = 0
+        self.skipped = 0
+        # once something has gone to the tail, the head takes nothing more, so the order is kept
+        self.head_full = False
+
+    def append(self, s: str):
+        size = len(s.encode())
+        with self.lock:
+            if self.max_bytes is None or (not self.head_full and self.head_size + size <= self.max_bytes // 2):
+                self.head.append(s)
+                self.head_size += size
+                return
+            self.head_full = True
+
+            tail_max = self.max_bytes - self.max_bytes // 2
+            if size > tail_max:
+                # a character takes at least a byte
+                self.skipped += size - len(s[-tail_max:].encode())
+                s = s[-tail_max:]
+                size = len(s.encode())
+            self.tail.append((s, size))
+            self.tail_size += size
+            while self.tail_size > tail_max:
+                _, dropped = self.tail.popleft()
+                self.tail_size -= dropped
+                self.skipped += dropped
+
+    def getvalue(self) -> str:
+        with self.lock:
+            parts = self.head.copy()
+            if self.skipped:
+                parts.append(SKIP_MARK.format(self.skipped))
+            parts.extend(s for s, _ in self.tail)
+        return ''.join(parts)
+
+    def clear(self):
+        with self.lock:
+            self.head.clear()
+            self.head_size = 0
+            self.tail.clear()
+            self.tail_size = 0
+            self.skipped = 0
+            self.head_full = False
+
+
+class TranscriptLogMixin:
+    """
+    The session log of the logging communicator decorators, sync and async: a message a line
+    """
+    log: TranscriptBuffer
+
+    def append_log(self, s: str):
+        if s and s[-1] != '\n':
+            s += '\n'
+        self.log.append(s)
+
+    def get_log(self) -> str:
+        return self.log.getvalue()
+
+    def reset(self):
+        self.log.clear()
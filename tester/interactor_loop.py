@@ -0,0 +1,66 @@
+__all__ = ['run_async_sessions']
+
+import asyncio
+from typing import Any, Callable, Iterator
+
+from .interactive_task import AsyncAbsCommunicator, AsyncAbsInteractor, AsyncLoggingCommunicatorDecorator
+
+
+async def run_slot(
+        tests: Iterator[int],
+        communicator: AsyncAbsCommunicator,
+        interactor_factory: Callable[[AsyncAbsCommunicator], AsyncAbsInteractor],
+        environments: list[Any],
+        one_timeout: float,
+        max_log_bytes: int | None,
+        start_test: Callable[[int, AsyncAbsCommunicator], bool],
+        stop_test: Callable[[int], Any],
+        results: list[tuple[bool, str]],
+):
+    for i in tests:
+        if not await asyncio.to_thread(start_test, i, communicator):
+            return
+        log = AsyncLoggingCommunicatorDecorator(communicator, max_log_bytes)
+        try:
+            async with asyncio.timeout(one_timeout):
+                success = await interactor_factory(log).run(environments[i])
+            results[i] = (success, log.get_log())
+        except TimeoutError:
+            results[i] = (False, log.get_log() + "\nTimeout...")
+        except Exception:
+            results[i] = (False, log.get_log())
+        finally:
+            await asyncio.to_thread(stop_test, i)
+
+
+def run_async_sessions(
+        communicators: list[AsyncAbsCommunicator],
+        interactor_factory: Callable[[AsyncAbsCommunicator], AsyncAbsInteractor],
+        environments: list[Any],
+        one_timeout: float,
+        max_log_bytes: int | None,
+        start_test: Callable[[int, AsyncAbsCommunicator], bool],
+        stop_test: Callable[[int], Any],
+) -> list[tuple[bool, str]]:
+    """
+    Runs the interactive sessions of all the slots in one event loop.
+    A session out of time is cancelled, so no process has to be killed.
+    :param start_test: starts the program of a test, False if the container has failed
+    :param stop_test: stops the program of a test
+    :return: success and the log by test, tests which have not been run fail with "Error"
+    """
+    results: list[tuple[bool, str]] = [(False, "Error")] * len(environments)
+    # shared by the slots, the loop is single-threaded
+    tests = iter(range(len(environments)))
+
+    async def run_all():
+        await asyncio.gather(*(
+            run_slot(
+                tests, communicator, interactor_factory, environments, one_timeout, max_log_bytes,
+                start_test, stop_test, results,
+            )
+            for communicator in communicators
+        ))
+
+    asyncio.run(run_all())
+    return results
@@ -0,0 +1,140 @@
+__all__ = ['InteractorWorker']
+
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Connection
+import threading
+from typing import Any, Callable
+
+from .interactive_task import (
+    TRANSCRIPT_MAX_BYTES,
+    AbsCommunicator,
+    AbsInteractor,
+    LoggingCommunicatorDecorator,
+)
+
+
+# seconds for an interrupted interactor to notice that the program is gone
+RELEASE_TIMEOUT = 5
+
+
+def serve(
+        conn: Connection,
+        communicator: AbsCommunicator,
+        interactor_factory: Callable[[AbsCommunicator], AbsInteractor],
+        environments: list[Any],
+        max_log_bytes: int | None,
+):
+    """
+    The worker's loop: takes test indices until None and answers `(index, success, log, finished)`.
+    A watchdog answers for a test which is out of time with `finished=False`,
+    the real answer follows when the interactor returns.
+    """
+    send_lock = threading.Lock()
+    while (task := conn.recv()) is not None:
+        i, timeout = task
+        log = LoggingCommunicatorDecorator(communicator, max_log_bytes)
+        answered = False
+
+        def on_timeout():
+            nonlocal answered
+            with send_lock:
+                if not answered:
+                    answered = True
+                    conn.send((i, False, log.get_log() + "\nTimeout...", False))
+
+        watchdog = threading.Timer(timeout, on_timeout)
+        watchdog.start()
+        success = False
+        try:
+            success = interactor_factory(log).run(environments[i])
+        except Exception:
+            pass
+        finally:
+            watchdog.cancel()
+        with send_lock:
+            conn.send((i, success, log.get_log(), True) if not answered else (i, False, '', True))
+            answered = True
+
+
+class InteractorWorker:
+    """
+    A process which runs the interactor for one test after another,
+    so a test costs a message instead of starting processes
+    """
+
+    def __init__(
+            self,
+            communicator: AbsCommunicator,
+            interactor_factory: Callable[[AbsCommunicator], AbsInteractor],
+            environments: list[Any],
+            max_log_bytes: int | None = TRANSCRIPT_MAX_BYTES,
+    ):
+        self.args = (communicator, interactor_factory, environments, max_log_bytes)
+        self.process: Process | None = None
+        self.conn: Connection | None = None
+
+    def start(self):
+        self.conn, child_conn = Pipe()
+        self.process = Process(target=serve, args=(child_conn, *self.args), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def run_test(self, i: int, timeout: float, release: Callable[[], Any]) -> tuple[bool, str]:
+        """
+        Runs the interactor on the `i`-th environment
+        :param release: stops the program, so an interrupted interactor can return
+        :return: success and the log
+        """
+        if self.process is None:
+            self.start()
+        assert self.conn is not None
+        self.conn.send((i, timeout))
+        # the watchdog answers in `timeout`, the rest is a margin for a hung worker
+        if not self.conn.poll(timeout + RELEASE_TIMEOUT):
+            release()
+            self.restart()
+            return False, "Timeout..."
+        try:
+            _, success, log, finished = self.conn.recv()
+        except EOFError:
+            # the worker has died
+            release()
+            self.restart()
+            return False, "Error"
+        release()
+        if not finished and not self.conn.poll(RELEASE_TIMEOUT):
+            # the interactor is stuck by itself, not on the program
+            self.restart()
+        elif not finished:
+            try:
+                self.conn.recv()
+            except EOFError:
+                self.restart()
+        return success, log
+
+    def restart(self):
+        self.close(force=True)
+        self.start()
+
+    def close(self, force: bool = False):
+        if self.process is None:
+            return
+        assert self.conn is not None
+        if not force:
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+            self.process.join(RELEASE_TIMEOUT)
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+        self.process = None
+        self.conn = None
+
+    def __enter__(self) -> "InteractorWorker":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
@@ -0,0 +1,133 @@
+__all__ = ['TestLimits', 'TestStats', 'read_stats', 'summarize_stats']
+
+import os
+from pathlib import Path
+import signal
+
+from .bundle import Bundle
+
+
+class TestLimits:
+    def __init__(self, time_limit: float | None = None, memory_limit: int | None = None):
+        """
+        :param time_limit: seconds per test (wall clock and CPU)
+        :param memory_limit: megabytes of peak resident memory per test
+        """
+        self.time_limit = time_limit
+        self.memory_limit = memory_limit
+
+    def environment(self) -> dict[str, str]:
+        # read by the harness in the containers, 0 is no limit
+        return {
+            'TIME_LIMIT_MS': str(int(self.time_limit * 1000) if self.time_limit else 0),
+            'MEMORY_LIMIT_KB': str(self.memory_limit * 1024 if self.memory_limit else 0),
+        }
+
+
+class TestStats:
+    """
+    A record of one test written by the harness (see chore/harness/harness.c)
+    """
+
+    def __init__(
+            self,
+            verdict: str,
+            exit_code: int,
+            signal: int,
+            wall_ms: int,
+            cpu_ms: int,
+            memory_kb: int,
+            stderr: str = '',
+    ):
+        self.verdict = verdict  # OK, RE, TL or ML
+        self.exit_code = exit_code
+        self.signal = signal
+        self.wall_ms = wall_ms
+        self.cpu_ms = cpu_ms
+        self.memory_kb = memory_kb
+        # the beginning of the program's stderr
+        self.stderr = stderr
+
+    @classmethod
+    def parse(cls, line: str) -> "TestStats":
+        """
+        Parses `<verdict> <exit code> <signal> <wall ms> <cpu ms> <memory kb>`
+        :raises ValueError: on a malformed record
+        """
+        match line.split():
+            case [verdict, exit_code, signal, wall_ms, cpu_ms, memory_kb]:
+                return cls(
+                    verdict,
+                    exit_code=int(exit_code),
+                    signal=int(signal),
+                    wall_ms=int(wall_ms),
+                    cpu_ms=int(cpu_ms),
+                    memory_kb=int(memory_kb),
+                )
+        raise ValueError(f'Malformed stats record: {line!r}')
+
+    def to_dict(self) -> dict:
+        return {
+            'verdict': self.verdict,
+            'exit_code': self.exit_code,
+            'signal': self.signal,
+            'wall_ms': self.wall_ms,
+            'cpu_ms': self.cpu_ms,
+            'memory_kb': self.memory_kb,
+            'stderr': self.stderr,
+        }
+
+    def error_message(self) -> str | None:
+        """
+        Describes a failed run for the user, None if the run has not failed
+        """
+        match self.verdict:
+            case 'ML':
+                return f"Memory limit exceeded: {self.memory_kb} KB"
+            case 'RE':
+                if self.signal:
+                    try:
+                        reason = f"signal {self.signal} ({signal.Signals(self.signal).name})"
+                    except ValueError:
+                        reason = f"signal {self.signal}"
+                else:
+                    reason = f"exit code {self.exit_code}"
+                message = f"Runtime error: {reason}"
+                if self.stderr.strip():
+                    message += '\n' + self.stderr.strip()
+                return message
+        return None
+
+
+def read_stats(data: os.PathLike, n_tests: int) -> list[TestStats | None]:
+    """
+    Reads `stats.txt` and the `stderr` bundle written by the harness into `data`
+    :return: stats by test, None for tests which have not been run
+    """
+    data = Path(data)
+    stats: list[TestStats | None] = [None] * n_tests
+    try:
+        with open(data / 'stats.txt') as f:
+            for i, line in zip(range(n_tests), f):
+                stats[i] = TestStats.parse(line)
+    except (FileNotFoundError, ValueError):
+        pass
+    try:
+        with Bundle(data / 'stderr') as bundle:
+            for i in range(min(n_tests, len(bundle))):
+                if (s := stats[i]) is not None:
+                    s.stderr = bundle[i]
+    except (FileNotFoundError, ValueError):
+        pass
+    return stats
+
+
+def summarize_stats(stats: list[TestStats | None]) -> dict | None:
+    measured = [s for s in stats if s is not None]
+    if not measured:
+        return None
+    return {
+        'max_wall_ms': max(s.wall_ms for s in measured),
+        'max_cpu_ms': max(s.cpu_ms for s in measured),
+        'max_memory_kb': max(s.memory_kb for s in measured),
+    }
@@ -1,32 +1,52 @@
-import ctypes
-from multiprocessing import Event, Manager, Pipe, Process
-from multiprocessing.managers import ValueProxy
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import Process
+import math
 import os
 import pathlib
-import re
-import select
 import shutil
+import socket
+import threading
 import time
-from typing import Any, Callable
+import typing
+from typing import Any, Iterator
 import logging
 
 import requests
 
+from .bank import TestBank
+from .bundle import write_bundle
+from .container_pool import ContainerPool, prepare_work_dir
 from .exceptions import MyContainerError, MyTimeoutError
-from .interactive_task import (
-    AbsCommunicator,
-    AbsInteractor,
-    InteractiveTask,
-    LoggingCommunicatorDecorator,
-    NamedPipeCommunicator,
-)
+from .interactive_run import run_interactive_program
+from .interactive_task import InteractiveTask
+from .limits import TestStats, summarize_stats
+from .reference_cache import ReferenceCache
 from .results import *
-from .simple_task import AbsChecker, AbsGenerator, SimpleTask
+from .simple_task import AbsChecker, SimpleTask
 from .tasks.task_dict import TASK_DICT
-from .testers import AbsTester, TESTER_DICT, split_log_by_tests
+from .testers import AbsTester, TESTER_DICT, docker_engine
 
 
 SECRET = os.environ["SECRET"]
+# the number of submissions tested at the same time
+WORKERS = int(os.environ.get("WORKERS", 1))
+# idle containers kept per language image by every worker, 0 disables the pool
+POOL_SIZE = int(os.environ.get("POOL_SIZE", 1))
+# the webserver which hands out the jobs
+SERVER_URL = os.environ.get("SERVER_URL", "http://0.0.0.0").rstrip('/')
+# tells the workers of different testers apart
+NODE_NAME = os.environ.get("NODE_NAME", socket.gethostname())
+JOBS_DIR = pathlib.Path('jobs', NODE_NAME).absolute()
+# seconds an idle worker waits for a job in one request
+LEASE_WAIT = 20
+# seconds for the webserver to answer a request of a worker (besides `/lease`)
+REQUEST_TIMEOUT = 10
+# tries to submit a result, after them the job is left to the expiry of its lease
+SUBMIT_ATTEMPTS = 5
+# seconds for a run of the first stages of the tests at the least
+STAGE_MIN_TIMEOUT = 20
+reference_cache = ReferenceCache.from_env()
 logging.basicConfig()
 logger = logging.Logger('tester', os.environ.get("LOG_LEVEL", logging.DEBUG))
 formatter = logging.Formatter('%(asctime)s:%(name)s:%(levelname)s: %(message)s')
@@ -35,274 +55,275 @@ log_handler.formatter = formatter
 logger.addHandler(log_handler)
 
 
-def generate_input(generator: AbsGenerator, n: int):
-    shutil.rmtree('data', ignore_errors=True)
-    os.mkdir('data')
-    for i in range(n):
-        fin = open(f'data/input{i}.txt', 'w')
-        test = generator.generate()
-        fin.write(test)
-        fin.close()
+def write_input(tests: list[str], work_dir: pathlib.Path):
+    data = work_dir / 'data'
+    shutil.rmtree(data, ignore_errors=True)
+    os.mkdir(data)
+    write_bundle(data / 'inputs', tests)
 
 
-def compare(checker: AbsChecker, output: list[str], expected: list[str], n: int) -> TesterResult:
+def draw_tests(task: SimpleTask | InteractiveTask, task_id: str, n: int, seed: str) -> list[Any]:
+    """
+    Takes inputs (environments for interactive tasks) from the task's bank
+    or generates them if there is no up-to-date bank
+    """
+    bank = TestBank.load(task_id, task)
+    if bank is not None:
+        return bank.draw(n, seed)
+    match task:
+        case SimpleTask():
+            return [task.generator.generate() for _ in range(n)]
+        case InteractiveTask():
+            return [task.env_generator.generate() for _ in range(n)]
+
+
+def run_reference(
+        task: SimpleTask,
+        task_id: str,
+        reference_tester: AbsTester,
+        tests: list[str],
+        timeout: int,
+) -> list[str]:
+    """
+    Takes expected outputs from the cache and runs the reference program only on the rest of the tests
+    """
+    reference_hash = ReferenceCache.reference_hash(task.reference_file, reference_tester)
+    expected = [reference_cache.lookup(task_id, reference_hash, test) for test in tests]
+    missing = [i for i, e in enumerate(expected) if e is None]
+    if not missing:
+        return typing.cast(list[str], expected)
+
+    write_input([tests[i] for i in missing], reference_tester.work_dir)
+    outputs = reference_tester.start(len(missing), task.reference_file, timeout)
+    for k, (i, output) in enumerate(zip(missing, outputs)):
+        expected[i] = output
+        if (stats := reference_tester.test_stats[k]) is not None and stats.verdict == 'OK':
+            reference_cache.store(task_id, reference_hash, tests[i], output)
+    return typing.cast(list[str], expected)
+
+
+def compare(
+        checker: AbsChecker,
+        output: list[str],
+        expected: list[str],
+        tests: list[str],
+        stats: list[TestStats | None] | None = None,
+) -> TesterResult:
+    n = len(tests)
+    if not stats:
+        stats = [None] * n
     different_inputs = []
     different_outputs = []
     different_expected = []
+    different_stats = []
     different = False
     for i in range(n):
-        with open(f'data/input{i}.txt') as fin:
-            test = fin.read()
+        test = tests[i]
         test_output = output[i]
         test_expected = expected[i]
+        test_stats = stats[i]
 
         ok = False
         try:
             ok = checker.check(test_expected, test_output, test)
         except Exception:
             pass
+        if test_stats is not None and (error := test_stats.error_message()) is not None:
+            ok = False
+            test_output += '\n\n' + error
         if not ok:
             different = True
             different_inputs.append(test)
             different_outputs.append(test_output)
             different_expected.append(test_expected)
+            different_stats.append(test_stats)
     if different:
-        return Difference(n, different_inputs, different_expected, different_outputs)
-    return Success(n)
+        return Difference(n, different_inputs, different_expected, different_outputs, stats=different_stats)
+    return Success(n, stats)
 
 
-def test_simple(task: SimpleTask, tester: AbsTester, file: str) -> TesterResult:
-    # try 1 test
-    generate_input(task.generator, 1)
-    try:
-        first_expected = task.default_tester.start(1, task.reference_file, 20)
-        first_output = tester.start(1, pathlib.Path('queue') / file, 20)
-    except MyTimeoutError:
-        with open(f'data/input0.txt') as fin:
-            test = fin.read()
-        return Timeout(1, [test])
-    if not isinstance(first_res := compare(task.checker, first_output, first_expected, 1), Success):
-        return first_res
-
-    # try the full set of tests if the first was successfull
-    generate_input(task.generator, task.n_tests)
-    expected = task.default_tester.start(task.n_tests, task.reference_file, task.timeout)
-    output = tester.start(
-        task.n_tests,
-        pathlib.Path('queue') / file,
-        task.timeout,
-    )
-
-    return compare(task.checker, output, expected, task.n_tests)
+class FailFast:
+    """
+    Checks the outputs while the program is still running (see `AbsTester.start`)
+    and stops the run after `limit` wrong answers.
+    The reference program runs at the same time, so the outputs which come before
+    its expected outputs wait for them and are checked with the next output.
+    """
 
+    def __init__(self, checker: AbsChecker, tests: list[str], expected: Future[list[str]], limit: int):
+        self.checker = checker
+        self.tests = tests
+        self.expected = expected
+        self.limit = limit
+        self.outputs: list[str] = []
+        self.differences = 0
+        # the number of tests checked before the run was stopped
+        self.checked = 0
+        self.stopped = False
+
+    def __call__(self, i: int, output: str) -> bool:
+        self.outputs.append(output)
+        if not self.expected.done() or self.expected.exception() is not None:
+            return False
+        expected = self.expected.result()
+        while not self.stopped and self.checked < len(self.outputs):
+            j = self.checked
+            ok = False
+            try:
+                ok = self.checker.check(expected[j], self.outputs[j], self.tests[j])
+            except Exception:
+                pass
+            self.checked = j + 1
+            if not ok:
+                self.differences += 1
+            self.stopped = self.differences >= self.limit
+        return self.stopped
+
+
+def judge(
+        task: SimpleTask,
+        tests: list[str],
+        output: list[str],
+        expected: list[str],
+        stats: list[TestStats | None],
+) -> TesterResult:
+    """
+    Checks the per-test limits and then the outputs
+    """
+    too_slow = [i for i, s in enumerate(stats) if s is not None and s.verdict == 'TL']
+    if too_slow:
+        return Timeout(len(tests), [tests[i] for i in too_slow], [stats[i] for i in too_slow])
+    return compare(task.checker, output, expected, tests, stats)
 
-def interactor_process(
-        log: ValueProxy[str],
-        success: ValueProxy[bool],
-        communicator: AbsCommunicator,
-        interactor_factory: Callable[[AbsCommunicator], AbsInteractor],
-        environment: Any,
-):
-    class SharingCommunicatorDecorator(LoggingCommunicatorDecorator):
-        def append_log(self, s: str):
-            super().append_log(s)
-            log.value = self.get_log()
 
-    interactor = interactor_factory(SharingCommunicatorDecorator(communicator))
-    try:
-        success.value = interactor.run(environment)
-    except Exception:
-        pass
-
-
-def timeout_read(source: str, timeout: float) -> str | None:
-    fd = os.open(source, os.O_NONBLOCK)
-    poll = select.poll()
-    poll.register(fd)
-    poll_result = poll.poll(timeout * 1000)
-    if poll_result and poll_result[0][1] & select.POLLIN != 0:
-        msg = os.read(fd, 1024).decode()
-        os.close(fd)
-        return msg
-    os.close(fd)
-    return None
-
-
-def nonblocking_write(fifo: str, timeout: int, message: str) -> bool:
-    fd = None
-    start = time.time()
-    while time.time() < start + timeout:
-        try:
-            fd = os.open(fifo, os.O_NONBLOCK | os.O_WRONLY)
-            os.write(fd, message.encode())
-            return True
-        except OSError:
-            pass
-        finally:
-            if fd is not None:
-                os.close(fd)
-        time.sleep(0.5)
-    return False
+def stage_timeout(task: SimpleTask, n: int) -> int:
+    """
+    Seconds for `n` tests of a task, the task's timeout is meant for the full set
+    """
+    return max(STAGE_MIN_TIMEOUT, math.ceil(task.timeout * n / task.n_tests))
 
 
-def run_interactive_program(
-        n_tests: int,
-        environments: list[Any],
-        one_timeout: int,
-        task: InteractiveTask,
+def test_simple(
+        task: SimpleTask,
+        task_id: str,
         tester: AbsTester,
-        file: os.PathLike
-) -> list[tuple[bool, str]]:
-    shutil.rmtree('data', ignore_errors=True)
-    os.mkdir('data')
-    prev_umask = os.umask(0)
-    os.mkfifo('data/to_cont')
-    os.mkfifo('data/to_py')
-    os.umask(prev_umask)
-    interactor_communicator = NamedPipeCommunicator()
-    interactor_communicator.setup()
-
-    log_pipe_read, log_pipe_write = Pipe(duplex=False)
-    start_timeout = 15 if tester is not TESTER_DICT['cs'] else 25
-    container_manager = Process(
-        target=tester.start_interactive,
-        args=(
-            n_tests,
-            start_timeout + int(one_timeout * 1.3 * n_tests),
-            file,
-            log_pipe_write,
-        ),
+        reference_tester: AbsTester,
+        file: pathlib.Path,
+        work_dir: pathlib.Path,
+) -> TesterResult:
+    """
+    Runs the tests stage by stage (see `TaskBase.stages`) and stops at the first failing stage
+    """
+    all_tests = draw_tests(task, task_id, task.n_tests, f'{file.name}:{task.n_tests}')
+    all_stats: list[TestStats | None] = []
+    for start, end in task.stages():
+        tests = all_tests[start:end]
+        timeout = stage_timeout(task, len(tests))
+        fail_fast = None
+        try:
+            # the reference program runs alongside in its own directory
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                expected_future = executor.submit(run_reference, task, task_id, reference_tester, tests, timeout)
+                write_input(tests, work_dir)
+                if task.fail_fast:
+                    fail_fast = FailFast(task.checker, tests, expected_future, task.fail_fast)
+                output = tester.start(len(tests), file, timeout, task.limits, fail_fast)
+            expected = expected_future.result()
+        except MyTimeoutError:
+            return Timeout(end, tests if start == 0 else None)
+        stats = tester.test_stats
+
+        if fail_fast is not None and fail_fast.stopped:
+            # the tests after the last checked one have not been run
+            n = fail_fast.checked
+            tests, output, expected, stats = tests[:n], output[:n], expected[:n], stats[:n]
+        result = judge(task, tests, output, expected, stats)
+        if isinstance(result, (Difference, Timeout)):
+            # the tests of the previous stages count too
+            result.n_tests += start
+            return result
+        all_stats.extend(stats)
+    return Success(task.n_tests, all_stats)
+
+
+def run_reference_transcripts(
+        task: InteractiveTask,
+        task_id: str,
+        reference_tester: AbsTester,
+        environments: list[Any],
+) -> list[str]:
+    """
+    Takes transcripts of the reference program from the cache and runs it only on the rest of the environments.
+    Environments are told apart by the task's presenter, without a presenter nothing is cached.
+    """
+    reference_hash = ReferenceCache.reference_hash(task.reference_file, reference_tester)
+    keys = [task.env_to_string(environment) for environment in environments]
+    transcripts = [
+        reference_cache.lookup_transcript(task_id, reference_hash, key) if key is not None else None
+        for key in keys
+    ]
+    missing = [i for i, t in enumerate(transcripts) if t is None]
+    if not missing:
+        return typing.cast(list[str], transcripts)
+
+    results = run_interactive_program(
+        len(missing),
+        [environments[i] for i in missing],
+        task.one_timeout,
+        task,
+        reference_tester,
+        task.reference_file,
     )
-    container_manager.start()
-    try:
-        container_message = timeout_read('data/to_py', start_timeout)
-        if container_message is None:
-            raise RuntimeError('Container has not started')
-        container_message = container_message.strip()
-        if container_message == "CompilationError":
-            if log_pipe_read.poll(5):
-                return [(False, log_pipe_read.recv())] * n_tests
-            raise MyContainerError("")
-        elif container_message != "Start":
-            raise MyContainerError(container_message)
-
-        results: list[tuple[bool, str]] = []
-        error = False  # container suddenly has stopped
-        for i in range(len(environments)):
-            if error:
-                results.append((False, "Error"))
-                continue
-            if not nonblocking_write('data/to_cont', 5, 'next\n'):
-                error = True
-                results.append((False, "Error"))
-                continue
-            with Manager() as manager:
-                log = manager.Value(ctypes.c_wchar_p, "")
-                success = manager.Value(ctypes.c_bool, False)
-                interactor = Process(
-                    target=interactor_process,
-                    args=(
-                        log,
-                        success,
-                        interactor_communicator,
-                        task.interactor_factory,
-                        environments[i],
-                    ),
-                )
-                interactor.start()
-                interactor.join(one_timeout)
-
-                if interactor.exitcode is None:
-                    interactor.terminate()
-                    interactor.join()
-                    results.append((False, log.value + "\nTimeout..."))
-                else:
-                    results.append((success.value, log.value))
-                if not nonblocking_write('data/to_cont', 5, 'next\n'):
-                    error = True
-
-        if log_pipe_read.poll(1):
-            full_outputs = split_log_by_tests(log_pipe_read.recv(), [r[1] for r in results], n_tests)
-            results = [(results[i][0], full_outputs[i]) for i in range(len(results))]
-        return results
-
-    finally:
-        container_manager.join()
-
+    if not all(success for success, _ in results):
+        logger.error(f"Reference program {task.reference_file} failed")
+    for i, (success, transcript) in zip(missing, results):
+        transcripts[i] = transcript
+        # a failed run may be a fluke of the host, it is not kept
+        if success and (key := keys[i]) is not None:
+            reference_cache.store_transcript(task_id, reference_hash, key, transcript)
+    return typing.cast(list[str], transcripts)
 
-def test_interactive(task: InteractiveTask, tester: AbsTester, file: str) -> TesterResult:
-    file_path = pathlib.Path('queue') / file
 
-    # try 1 test
-    environment = task.env_generator.generate()
-    try:
-        result = run_interactive_program(
-            1,
-            [environment],
-            task.one_timeout,
-            task,
-            tester,
-            file_path
-        )[0]
-        if not result[0]:
-            correct_example = run_interactive_program(
-                1,
-                [environment],
-                task.one_timeout,
-                task,
-                task.default_tester,
-                task.reference_file
-            )[0]
-            if not correct_example[0]:
-                logger.error(f"Reference program {task.reference_file} failed")
+def test_interactive(
+        task: InteractiveTask,
+        task_id: str,
+        tester: AbsTester,
+        reference_tester: AbsTester,
+        file_path: pathlib.Path,
+) -> TesterResult:
+    """
+    Runs the tests stage by stage (see `TaskBase.stages`) and stops at the first failing stage
+    """
+    environments = draw_tests(task, task_id, task.n_tests, f'{file_path.name}:{task.n_tests}')
+    for start, end in task.stages():
+        stage = environments[start:end]
+        try:
+            result = run_interactive_program(len(stage), stage, task.one_timeout, task, tester, file_path)
+        except MyTimeoutError:
+            env_texts = [task.env_to_string(environment) for environment in stage]
+            return Timeout(end, typing.cast(list[str], env_texts) if None not in env_texts else None)
+
+        errored_results = [(stage[i], log) for i, (success, log) in enumerate(result) if not success]
+        if errored_results:
+            correct = run_reference_transcripts(task, task_id, reference_tester, [er[0] for er in errored_results])
             return Difference(
-                1,
-                [task.env_to_string(environment) or ""],
-                [correct_example[1]],
-                [result[1]],
+                end,
+                [task.env_to_string(er[0]) or "" for er in errored_results],
+                correct,
+                [er[1] for er in errored_results],
                 interactive=True,
             )
-    except MyTimeoutError:
-        env_text = task.env_to_string(environment)
-        return Timeout(1, [env_text] if env_text is not None else None)
-
-    # run the full set of tests
-    environments = [task.env_generator.generate() for _ in range(task.n_tests)]
-    result = run_interactive_program(
-        task.n_tests,
-        environments,
-        task.one_timeout,
-        task,
-        tester,
-        file_path
-    )
-    errored_results: list[tuple[Any, str]] = []
-    for i in range(task.n_tests):
-        if not result[i][0]:
-            errored_results.append((environments[i], result[i][1]))
-    if not errored_results:
-        return Success(task.n_tests)
-
-    correct = run_interactive_program(
-        len(errored_results),
-        [er[0] for er in errored_results],
-        task.one_timeout,
-        task,
-        task.default_tester,
-        task.reference_file,
-    )
-    if not all(map(lambda r: r[0], correct)):
-        logger.error(f"Reference program {task.reference_file} failed")
-    return Difference(
-        task.n_tests,
-        [task.env_to_string(er[0]) or "" for er in errored_results],
-        [r[1] for r in correct],
-        [er[1] for er in errored_results],
-        interactive=True,
-    )
+    return Success(task.n_tests)
 
 
-def do_test(tester: AbsTester, task: SimpleTask | InteractiveTask, file: str) -> TesterResult:
+def do_test(
+        tester: AbsTester,
+        task: SimpleTask | InteractiveTask,
+        task_id: str,
+        file: pathlib.Path,
+        work_dir: pathlib.Path,
+        pool: ContainerPool | None = None,
+) -> TesterResult:
     """
     Codes:
     -1 - internal error
@@ -310,12 +331,17 @@ def do_test(tester: AbsTester, task: SimpleTask | InteractiveTask, file: str) ->
     1 - difference found
     2 - timeout error
     """
+    # the reference program gets its own directory, so only the missing outputs are computed
+    prepare_work_dir(work_dir)
+    prepare_work_dir(work_dir / 'reference')
+    tester = tester.for_job(work_dir, pool)
+    reference_tester = task.reference_tester(work_dir / 'reference', pool)
     try:
         match task:
             case SimpleTask():
-                return test_simple(task, tester, file)
+                return test_simple(task, task_id, tester, reference_tester, file, work_dir)
             case InteractiveTask():
-                return test_interactive(task, tester, file)
+                return test_interactive(task, task_id, tester, reference_tester, file)
     except MyContainerError as e:
         logger.error(f"ContainerError {e}")
         return Error(e.message)
@@ -324,62 +350,183 @@ def do_test(tester: AbsTester, task: SimpleTask | InteractiveTask, file: str) ->
     except Exception as e:
         logger.error(f"Critical error {type(e)} {e}")
         return Error("Critical error")
+    finally:
+        logger.debug(
+            f"Container runs (ms): reference {reference_tester.run_times_ms}, submission {tester.run_times_ms}"
+        )
+        logger.debug(
+            f"Tests: reference {summarize_stats(reference_tester.test_stats)}, "
+            f"submission {summarize_stats(tester.test_stats)}"
+        )
+
+
+def authorize():
+    logger.info("Connecting...")
+    while True:
+        try:
+            hello = requests.post(f"{SERVER_URL}/ws_hello", json={'token': SECRET}, timeout=REQUEST_TIMEOUT)
+            if hello.text == 'ok':
+                break
+            raise RuntimeError("Authorization failed!")
+        except requests.RequestException as e:
+            logger.warning(f"Connection failed ({type(e)}). Trying again...")
+        time.sleep(2)
+    logger.info("Authorized. Start scanning...")
+
+
+def submit_result(resp: dict):
+    for _ in range(SUBMIT_ATTEMPTS):
+        try:
+            response = requests.post(
+                f"{SERVER_URL}/ws", json={'token': SECRET, 'data': resp}, timeout=REQUEST_TIMEOUT,
+            )
+            if response.text == 'ok':
+                logger.info("Submitted")
+                return
+            if response.text == 'stale':
+                logger.warning(f"The lease of job {resp['job_id']} has expired, the result is dropped")
+                return
+            logger.error(f"Can't submit: HTTP code {response.status_code}")
+        except requests.RequestException as e:
+            logger.error(f"Can't submit: {type(e)} {e}")
+        time.sleep(2)
+    logger.error(f"The result of job {resp['job_id']} is dropped, the job is leased again when its lease expires")
+
+
+def lease_job(worker_name: str) -> dict | None:
+    """
+    Takes the oldest job with its program from the webserver's queue for a while (see `keep_lease`).
+    Waits for a job up to `LEASE_WAIT` seconds.
+    """
+    try:
+        response = requests.post(
+            f"{SERVER_URL}/lease",
+            json={'token': SECRET, 'worker': worker_name, 'wait': LEASE_WAIT},
+            timeout=LEASE_WAIT + 10,
+        )
+        response.raise_for_status()
+    except requests.RequestException as e:
+        logger.error(f"Can't lease a job: {type(e)} {e}")
+        time.sleep(2)
+        return None
+    return response.json()
+
+
+@contextmanager
+def keep_lease(job: dict, worker_name: str) -> Iterator[None]:
+    """
+    Extends the lease of a job with heartbeats while it is being tested
+    """
+    stopped = threading.Event()
+
+    def beat():
+        while not stopped.wait(job['ttl'] / 3):
+            try:
+                response = requests.post(
+                    f"{SERVER_URL}/heartbeat",
+                    json={'token': SECRET, 'job_id': job['id'], 'worker': worker_name},
+                    timeout=job['ttl'] / 3,
+                )
+                if response.status_code == 409:
+                    logger.warning(f"The lease of job {job['id']} has expired")
+                    return
+            except requests.RequestException as e:
+                logger.error(f"Can't send a heartbeat: {type(e)} {e}")
+
+    heart = threading.Thread(target=beat, daemon=True)
+    heart.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        # a heartbeat in flight ends with its timeout, the daemon thread is not waited for
+
+
+def process_job(job: dict, job_dir: pathlib.Path, pool: ContainerPool | None, worker_name: str):
+    user_id, task_id, language = job['user_id'], job['task'], job['language']
+    resp: dict[str, Any]
+    time_start = time.time()
+    if task_id not in TASK_DICT or language not in TESTER_DICT:
+        logger.error(f"Unknown task or language of job {job['id']}: {task_id} {language}")
+        resp = Error("Unknown task or language").to_dict()
+    else:
+        task = TASK_DICT[task_id]
+        tester = TESTER_DICT[language] # type: ignore
+        logger.info(f"Do {task_id} on {language} for {user_id} in {job_dir.name}")
+        # the name of the file seeds the tests, the id of the job is safe for a file name
+        file = job_dir / f"{job['id']}.txt"
+        try:
+            file.write_text(job['program'])
+            with keep_lease(job, worker_name):
+                resp = do_test(tester, task, task_id, file, job_dir, pool).to_dict()
+        except Exception as e:
+            # the job is finished anyway, a leased job left behind would be leased again forever
+            logger.error(f"Critical error {type(e)} {e}")
+            resp = Error("Critical error").to_dict()
+        finally:
+            file.unlink(missing_ok=True)
+    work_time = time.time() - time_start
+    logger.info(f"Done: {work_time}")
+
+    resp['task'] = task_id
+    resp['language'] = language
+    resp['time'] = work_time
+    resp['user_id'] = user_id
+    resp['job_id'] = job['id']
+    resp['worker'] = worker_name
+
+    submit_result(resp)
+
+
+def worker(worker_id: int):
+    job_dir = JOBS_DIR / str(worker_id)
+    job_dir.mkdir(parents=True, exist_ok=True)
+    # a restarted worker gets the same name, the webserver tells the workers apart by it
+    worker_name = f'{NODE_NAME}-{worker_id}'
+    pool = None
+    if POOL_SIZE > 0:
+        pool = ContainerPool(docker_engine(), job_dir / 'lanes', POOL_SIZE)
+        pool.fill({t.image for t in TESTER_DICT.values()})
+    while True:
+        try:
+            job = lease_job(worker_name)
+            if job is not None:
+                process_job(job, job_dir, pool, worker_name)
+        except KeyboardInterrupt:
+            return
+        except Exception as e:
+            logger.error(f"Worker {worker_id} error: {type(e)} {e}")
+            time.sleep(3)
+
+
+def run_workers(n: int):
+    if n == 1:
+        worker(0)
+        return
+
+    processes: dict[int, Process] = {}
+    try:
+        while True:
+            for i in range(n):
+                if i not in processes or not processes[i].is_alive():
+                    if i in processes:
+                        logger.error(f"Worker {i} has died ({processes[i].exitcode}). Restarting...")
+                    processes[i] = Process(target=worker, args=(i,), name=f'worker-{i}')
+                    processes[i].start()
+            time.sleep(1)
+    finally:
+        for p in processes.values():
+            p.terminate()
+        for p in processes.values():
+            p.join()
 
 
 def main():
     while True:
         try:
-            logger.info("Connecting...")
-            while True:
-                try:
-                    hello = requests.post("http://0.0.0.0:80/ws_hello", json={'token': SECRET})
-                    if hello.text == 'ok':
-                        break
-                    raise RuntimeError("Authorization failed!")
-                except requests.RequestException as e:
-                    logger.warning(f"Connection failed ({type(e)}). Trying again...")
-                time.sleep(2)
-            logger.info("Authorized. Start scanning...")
-
-            while True:
-                queue = sorted(os.listdir('queue'))
-                if len(queue) != 0:
-                    first = queue[0]
-                    # timestamp, user id, task, language
-                    tasks = '|'.join(t for t in TASK_DICT)
-                    langs = '|'.join(t for t in TESTER_DICT)
-                    match_ = re.match('[0-9]+_([0-9a-f]{64})_(%s)_(%s)\\.txt' % (tasks, langs), first)
-                    if not match_:
-                        logger.error(f"Trash detected: {first}")
-                        time.sleep(2)
-                        continue
-                    query_info = match_.groups()
-                    user_id = query_info[0]
-                    task = TASK_DICT[query_info[1]]
-                    tester = TESTER_DICT[query_info[2]] # type: ignore
-
-                    time_start = time.time()
-                    logger.info(f"Do {query_info[1]} on {query_info[2]} for {user_id}")
-                    resp = do_test(tester, task, first).to_dict()
-                    work_time = time.time() - time_start
-                    logger.info(f"Done: {work_time}")
-
-                    resp['task'] = query_info[1]
-                    resp['language'] = query_info[2]
-                    resp['time'] = work_time
-                    resp['user_id'] = user_id
-                    os.remove('queue/' + first)
-
-                    while True:
-                        try:
-                            resp = requests.post("http://0.0.0.0/ws", json={'token': SECRET, 'data': resp})
-                            if resp.text == 'ok':
-                                logger.info("Submitted")
-                                break
-                            logger.error(f"Can't submit: HTTP code {resp.status_code}")
-                        except requests.RequestException as e:
-                            logger.error(f"Can't submit: {type(e)} {e}")
-                time.sleep(1)
+            authorize()
+            logger.info(f"Starting {WORKERS} worker(s)")
+            run_workers(WORKERS)
 
         except KeyboardInterrupt:
             logger.info("Stopped")
@@ -391,4 +538,3 @@ def main():
 
 if __name__ == '__main__':
     main()
-
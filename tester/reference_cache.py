@@ -0,0 +1,110 @@
+__all__ = ['ReferenceCache']
+
+import hashlib
+import os
+from pathlib import Path
+import typing
+from typing import Iterator
+import uuid
+
+from .build_cache import BuildCache, SizeCap
+
+if typing.TYPE_CHECKING:
+    from .testers import AbsTester
+
+
+class ReferenceCache:
+    """
+    Expected outputs of reference programs stored on the host by the task id,
+    the reference program hash, and the input hash.
+    Transcripts of interactive reference runs are kept the same way by the environment hash.
+    The least recently used files are evicted when the cache grows over `max_bytes`.
+    """
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = root.absolute()
+        self.cap = SizeCap(max_bytes, self.scan, self.remove)
+
+    @classmethod
+    def from_env(cls) -> "ReferenceCache":
+        """
+        The cache of the tester in `cache/reference`, capped by REFERENCE_CACHE_MB
+        """
+        return cls(Path('cache/reference').absolute(), int(os.environ.get('REFERENCE_CACHE_MB', 1024)) * 2**20)
+
+    @staticmethod
+    def reference_hash(reference_file: Path, tester: "AbsTester") -> str:
+        return BuildCache.key(tester.image_id(), tester.build_flags() or '', reference_file.read_bytes())
+
+    def path(self, task_id: str, reference_hash: str, test: str) -> Path:
+        input_hash = hashlib.sha256(test.encode()).hexdigest()
+        return self.root / task_id / reference_hash / input_hash
+
+    def transcript_path(self, task_id: str, reference_hash: str, environment: str) -> Path:
+        """
+        :param environment: the environment as shown by the task's presenter
+        """
+        environment_hash = hashlib.sha256(environment.encode()).hexdigest()
+        return self.root / task_id / reference_hash / 'transcripts' / environment_hash
+
+    def lookup(self, task_id: str, reference_hash: str, test: str) -> str | None:
+        return self.get(self.path(task_id, reference_hash, test))
+
+    def store(self, task_id: str, reference_hash: str, test: str, output: str):
+        self.put(self.path(task_id, reference_hash, test), output)
+
+    def lookup_transcript(self, task_id: str, reference_hash: str, environment: str) -> str | None:
+        return self.get(self.transcript_path(task_id, reference_hash, environment))
+
+    def store_transcript(self, task_id: str, reference_hash: str, environment: str, transcript: str):
+        self.put(self.transcript_path(task_id, reference_hash, environment), transcript)
+
+    def get(self, path: Path) -> str | None:
+        text = self.read(path)
+        if text is not None:
+            try:
+                # mark as recently used
+                os.utime(path)
+            except OSError:
+                pass
+        return text
+
+    def put(self, path: Path, text: str):
+        self.write(path, text)
+        self.cap.added(len(text.encode()))
+
+    def scan(self) -> Iterator[tuple[float, int, str]]:
+        for dir_path, _, files in os.walk(self.root):
+            for name in files:
+                if name.startswith('.tmp-'):
+                    continue
+                path = os.path.join(dir_path, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+
+    @staticmethod
+    def remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def read(path: Path) -> str | None:
+        try:
+            with open(path) as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def write(path: Path, text: str):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f'.tmp-{uuid.uuid4().hex}')
+        with open(tmp, 'w') as f:
+            f.write(text)
+        # atomic, so concurrent workers never read a half-written output
+        os.replace(tmp, path)
@@ -3,6 +3,8 @@ __all__ = ["TesterResult", "Success", "Difference", "Timeout", "Error"]
 from abc import ABC, abstractmethod
 from typing import Any
 
+from .limits import TestStats, summarize_stats
+
 
 class TesterResult(ABC):
     @abstractmethod
@@ -10,12 +12,20 @@ class TesterResult(ABC):
         pass
 
 
+def stats_list(stats: list[TestStats | None]) -> list[dict | None]:
+    return [s.to_dict() if s is not None else None for s in stats]
+
+
 class Success(TesterResult):
-    def __init__(self, n_tests: int):
+    def __init__(self, n_tests: int, stats: list[TestStats | None] | None = None):
         self.n_tests = n_tests
+        self.stats = stats
 
     def to_dict(self) -> dict:
-        return {'code': 0, 'tests': self.n_tests}
+        result: dict[str, Any] = {'code': 0, 'tests': self.n_tests}
+        if self.stats and (summary := summarize_stats(self.stats)) is not None:
+            result['stats'] = summary
+        return result
 
 
 class Difference(TesterResult):
@@ -26,15 +36,18 @@ class Difference(TesterResult):
         expecteds: list[str],
         outputs: list[str],
         interactive: bool = False,
+        stats: list[TestStats | None] | None = None,
     ):
         self.inputs = inputs
         self.expecteds = expecteds
         self.outputs = outputs
         self.n_tests = n_tests
         self.interactive = interactive
+        # of the failed tests
+        self.stats = stats
 
     def to_dict(self) -> dict:
-        return {
+        result = {
             'code': 1,
             'tests': self.n_tests,
             'input': self.inputs,
@@ -42,17 +55,29 @@ class Difference(TesterResult):
             'output': self.outputs,
             'interactive': self.interactive,
         }
+        if self.stats:
+            result['test_stats'] = stats_list(self.stats)
+        return result
 
 
 class Timeout(TesterResult):
-    def __init__(self, n_tests: int, inputs: list[str] | None = None):
+    def __init__(
+        self,
+        n_tests: int,
+        inputs: list[str] | None = None,
+        stats: list[TestStats | None] | None = None,
+    ):
         self.inputs = inputs
         self.n_tests = n_tests
+        # of the tests which have exceeded the limit
+        self.stats = stats
 
     def to_dict(self) -> dict:
         result: dict[str, Any] = {'code': 2, 'tests': self.n_tests}
         if self.inputs is not None:
             result['input'] = self.inputs
+        if self.stats:
+            result['test_stats'] = stats_list(self.stats)
         return result
 
 
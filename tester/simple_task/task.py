@@ -1,5 +1,7 @@
 import typing
+from typing import Sequence
 
+from ..limits import TestLimits
 from ..tasks.task_base import TaskBase
 
 if typing.TYPE_CHECKING:
@@ -16,9 +18,22 @@ class SimpleTask(TaskBase):
             reference: tuple[str, "AbsTester"],
             n_tests: int,
             timeout: int,
+            time_limit: float | None = None,
+            memory_limit: int | None = None,
+            fail_fast: int | None = None,
+            escalation: Sequence[int] = (1,),
     ):
-        super().__init__(reference, n_tests)
+        """
+        :param timeout: seconds for the whole run of all the tests
+        :param time_limit: seconds per test
+        :param memory_limit: megabytes per test
+        :param fail_fast: stop the run after this number of wrong answers
+        :param escalation: the numbers of tests run before the full set (see `TaskBase`)
+        """
+        super().__init__(reference, n_tests, escalation)
         self.generator = generator
         self.checker = checker
         self.timeout = timeout
+        self.limits = TestLimits(time_limit, memory_limit)
+        self.fail_fast = fail_fast
 
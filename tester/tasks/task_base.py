@@ -1,7 +1,9 @@
 import pathlib
 import typing
+from typing import Sequence
 
 if typing.TYPE_CHECKING:
+    from ..container_pool import ContainerPool
     from ..testers import AbsTester
 
 
@@ -10,8 +12,23 @@ class TaskBase:
             self,
             reference: tuple[str, "AbsTester"],
             n_tests: int,
+            escalation: Sequence[int] = (1,),
     ):
+        """
+        :param escalation: the numbers of tests run before the full set, e.g. (1, 8, 64);
+            every stage runs only the tests which the previous ones have not, testing stops at the first failing stage
+        """
         self.reference_file: pathlib.Path = pathlib.Path().absolute().joinpath('reference', reference[0])
         self.default_tester = reference[1]
         self.n_tests = n_tests
+        self.escalation = tuple(escalation)
 
+    def reference_tester(self, work_dir: pathlib.Path, pool: "ContainerPool | None" = None) -> "AbsTester":
+        return self.default_tester.for_job(work_dir, pool)
+
+    def stages(self) -> list[tuple[int, int]]:
+        """
+        Ranges `[start, end)` of the tests of the stages, the last one ends with `n_tests`
+        """
+        ends = sorted({n for n in self.escalation if 0 < n < self.n_tests}) + [self.n_tests]
+        return list(zip([0] + ends[:-1], ends))
@@ -0,0 +1,50 @@
+from pathlib import Path
+import shutil
+import subprocess
+
+import pytest
+
+from .bundle import read_bundle, write_bundle
+
+HARNESS_SOURCE = Path(__file__).parent.parent / 'chore' / 'harness' / 'harness.c'
+
+
+@pytest.fixture
+def harness(tmp_path) -> tuple[Path, Path, Path]:
+    """
+    The harness built for temporary directories in place of the container's /data and /work
+    """
+    compiler = shutil.which('cc') or shutil.which('gcc')
+    if compiler is None:
+        pytest.skip('no C compiler')
+    data, work = tmp_path / 'data', tmp_path / 'work'
+    data.mkdir()
+    work.mkdir()
+    binary = tmp_path / 'harness'
+    subprocess.run(
+        [compiler, '-O2', f'-DDATA_DIR="{data}"', f'-DWORK_DIR="{work}"', '-o', binary, HARNESS_SOURCE],
+        check=True,
+    )
+    return binary, data, work
+
+
+def run(harness: tuple[Path, Path, Path], tests: list[str], program: str) -> list[str]:
+    binary, data, _ = harness
+    write_bundle(data / 'inputs', tests)
+    subprocess.run([binary, str(len(tests)), 'sh', '-c', program], check=True)
+    return read_bundle(data / 'outputs')
+
+
+def test_stdout_is_the_output(harness):
+    assert run(harness, ['1 2\n', '3 4\n'], 'read a b; echo $((a + b))') == ['3\n', '7\n']
+
+
+def test_output_file_is_the_output(harness):
+    # file I/O in the work directory, as the run scripts did before the harness
+    outputs = run(harness, ['1 2\n', '3 4\n'], 'read a b < input.txt; echo $((a * b)) > output.txt')
+    assert outputs == ['2\n', '12\n']
+
+
+def test_output_file_of_a_previous_test_is_not_reused(harness):
+    outputs = run(harness, ['1\n', '2\n'], 'read a; [ "$a" = 1 ] && echo first > output.txt; true')
+    assert outputs == ['first\n', '']
@@ -1,100 +1,209 @@
 from abc import ABC, abstractmethod
-from multiprocessing.connection import Connection
+import concurrent.futures
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import copy
 import os
 from os import PathLike
 import pathlib
 from pathlib import Path
 import shutil
+import threading
 import time
-from typing import Callable, Literal
+from typing import Callable, Iterator, Literal, Self
 
 import docker
 import docker.errors
 from docker.models.containers import Container
+from docker.utils.socket import frames_iter
 import requests
 
+from .build_cache import BuildCache
+from .bundle import Bundle
+from .container_pool import ContainerPool, WarmContainer, clear_dir
 from .exceptions import MyContainerError, MyTimeoutError
+from .limits import TestLimits, TestStats, read_stats
 
 
-TEST_SEPARATOR_PATTERN = "<<<ARBUZ{}ARBUZ>>>"
+# seconds between checks for new outputs of a running container
+OUTPUT_POLL_INTERVAL = 0.02
+# bytes of stderr shown per interactive test, as in the harness
+STDERR_EXCERPT = 2048
 
-def split_log_by_tests(
-        log: str,
-        output: list[str],
-        n_tests: int,
-        check_function: Callable[[str], bool] = bool,
-        separator_pattern: str = TEST_SEPARATOR_PATTERN,
-) -> list[str]:
+
+def disable_socket_timeout(sock):
+    """
+    The socket of an exec may be a SocketIO wrapping the socket (unix sockets)
+    """
+    for s in (sock, getattr(sock, '_sock', None)):
+        if hasattr(s, 'settimeout'):
+            s.settimeout(None)
+
+
+def read_exec_output(sock) -> bytes:
     """
-    Parses log and prepends it to output
+    Reads the multiplexed stdout and stderr of an exec until it exits
     """
-    output = output.copy()
-    p = 0
-    for i in range(n_tests):
-        separator = separator_pattern.format(i)
-        p = log.find(separator, p)
-        if p == -1:
-            break
-        p += len(separator)
-        p_next = log.find(separator_pattern.format(i+1), p)
-        if p_next == -1:
-            p_next = len(log)
-        extra = log[p:p_next].strip()
-        if check_function(extra):
-            output[i] += extra + '\n\n'
-        p = p_next
-    return output
+    try:
+        return b''.join(data for _, data in frames_iter(sock, tty=False))
+    finally:
+        sock.close()
 
 
 class AbsTester(ABC):
-    def __init__(self, work_dir: Path, docker_engine: docker.DockerClient):
+    image: str
+    # seconds the container has to report that the program is ready (interactive tasks)
+    start_timeout: int = 15
+    pool: ContainerPool | None = None
+    # a pooled container the tester is bound to (see `runtime`)
+    warm: WarmContainer | None = None
+    # a cold container running the tests
+    running: Container | None = None
+    # wall-clock time of every container run of the job in milliseconds
+    run_times_ms: list[float]
+    limits: TestLimits = TestLimits()
+    # measurements of the tests of the last run
+    test_stats: list[TestStats | None]
+
+    def __init__(
+            self,
+            work_dir: Path,
+            docker_engine: Callable[[], docker.DockerClient],
+            build_cache: BuildCache | None = None,
+    ):
+        """
+        :param docker_engine: gives the client of the current process (see `docker_engine`)
+        """
         self.work_dir = work_dir.absolute()
-        self.docker = docker_engine
+        self.chore_dir = self.work_dir / 'chore'
+        self.docker_engine = docker_engine
+        self.build_cache = build_cache
+        self.run_times_ms = []
+        self.test_stats = []
+
+    @property
+    def docker(self) -> "docker.DockerClient":
+        return self.docker_engine()
+
+    def for_job(self, work_dir: Path, pool: ContainerPool | None = None) -> Self:
+        """
+        Returns a copy of the tester which keeps `prog` and `data` in the job's own directory
+        """
+        tester = copy.copy(self)
+        tester.work_dir = work_dir.absolute()
+        tester.pool = pool
+        tester.run_times_ms = []
+        tester.test_stats = []
+        return tester
+
+    @contextmanager
+    def runtime(self) -> Iterator[Self]:
+        """
+        Yields a copy of the tester bound to a warm container from the pool.
+        Files of the job's `data` are hard linked into the container's directory.
+        Without a pool yields the tester itself.
+        """
+        if self.pool is None or self.warm is not None:
+            yield self
+            return
+
+        warm = self.pool.acquire(self.image)
+        try:
+            tester = copy.copy(self)
+            tester.work_dir = warm.lane
+            tester.warm = warm
+            for entry in os.scandir(self.local('data')):
+                if entry.is_file():
+                    os.link(entry.path, tester.local('data', entry.name))
+            yield tester
+        finally:
+            self.pool.release(warm)
 
     def local(self, *p: str) -> Path:
         return self.work_dir.joinpath(*p)
 
     def clean(self):
-        shutil.rmtree(self.local('prog'), ignore_errors=True)
-        self.local('prog').mkdir()
+        clear_dir(self.local('prog'))
         for i in os.listdir(self.local('data')):
-            if i.startswith('output'):
+            if i.startswith(('output', 'compile', 'stats', 'stderr')):
                 os.remove(self.local('data', i))
 
-    def start(self, n_tests: int, file_name: PathLike[str], timeout: int) -> list[str]:
-        self.clean()
-        self.setup(file_name)
-
-        log = self.run_container_for_tests(n_tests, timeout)
-        return self.process_log(self.read_output(n_tests), log)
-
-    def start_interactive(
+    def start(
             self,
             n_tests: int,
-            timeout: int,
             file_name: PathLike[str],
-            log_pipe: Connection | None = None,
-    ) -> str:
+            timeout: int,
+            limits: TestLimits | None = None,
+            on_output: Callable[[int, str], bool] | None = None,
+    ) -> list[str]:
+        """
+        Runs the tests from `data/inputs`, measurements are put into `test_stats`
+        :param on_output: called with every output as soon as its test finishes;
+            when it returns True the run is stopped and the rest of the outputs are empty
+        """
+        with self.runtime() as tester:
+            tester.clean()
+            tester.setup(file_name)
+            build_key = tester.restore_build(file_name)
+            tester.limits = limits or TestLimits()
+
+            finished = threading.Event()
+            watcher = None
+            if on_output is not None:
+                watcher = threading.Thread(target=tester.watch_outputs, args=(on_output, finished), daemon=True)
+                watcher.start()
+            try:
+                log = tester.run_container_for_tests(n_tests, timeout)
+            finally:
+                finished.set()
+                if watcher is not None:
+                    watcher.join()
+                tester.save_build(build_key)
+                # the list is shared with `self`
+                tester.test_stats[:] = read_stats(tester.local('data'), n_tests)
+            return tester.process_log(tester.read_output(n_tests), log)
+
+    def start_interactive(self, timeout: int, file_name: PathLike[str]) -> str:
+        """
+        Runs the harness which serves the control channel `data/control.sock`
+        """
         self.clean()
         self.setup_interactive(file_name)
+        build_key = self.restore_build(file_name)
 
-        container: Container | None = None
-        try:
-            container = self.start_interactive_container(n_tests)
+        command = self.interactive_command()
+        if self.warm is not None:
             try:
-                container.wait(timeout=timeout)
-            except requests.exceptions.RequestException:
-                raise MyTimeoutError()
+                return self.exec_in_warm_container(command, timeout)
+            finally:
+                self.save_build(build_key)
 
-            log = container.logs().decode()
-            if log_pipe is not None:
-                log_pipe.send(log)
-                log_pipe.close()
-            return log
+        container: Container | None = None
+        started = time.perf_counter()
+        try:
+            container = self.start_container(self.image, command)
+            self.wait_container(container, timeout)
+            return container.logs().decode()
         finally:
+            self.record_run_time(started)
+            self.save_build(build_key)
             if container is not None:
                 container.remove(force=True)
 
+    def read_stderr(self, test: int) -> str:
+        """
+        The beginning of the stderr of an interactive test
+        """
+        try:
+            with open(self.local('data', f'stderr-{test}.txt'), 'rb') as f:
+                excerpt = f.read(STDERR_EXCERPT + 1)
+        except FileNotFoundError:
+            return ''
+        text = excerpt[:STDERR_EXCERPT].decode(errors='replace')
+        if len(excerpt) > STDERR_EXCERPT:
+            text += '\n[truncated]'
+        return text
+
     @abstractmethod
     def setup(self, file_name: PathLike[str]):
         pass
@@ -108,7 +217,7 @@ class AbsTester(ABC):
         pass
 
     @abstractmethod
-    def start_interactive_container(self, n_tests: int) -> Container:
+    def interactive_command(self) -> str:
         pass
 
     def process_log(self, outputs: list[str], log: str) -> list[str]:
@@ -116,8 +225,40 @@ class AbsTester(ABC):
             raise MyContainerError(log)
         return outputs
 
+    def build_flags(self) -> str | None:
+        """
+        Everything besides the source that affects the compiled program.
+        Must be kept in sync with the run scripts. None means that nothing is compiled.
+        """
+        return None
+
+    def image_id(self) -> str:
+        """
+        Builds and reference outputs are kept by the image itself, not by its name:
+        a rebuilt image may have another compiler or runtime
+        """
+        return self.docker.images.get(self.image).id
+
+    def restore_build(self, file_name: PathLike[str]) -> str | None:
+        """
+        Puts a cached build into `prog/build`, so the run script skips the compilation
+        :return: the cache key to save a fresh build with (see `save_build`), None on a cache hit
+        """
+        flags = self.build_flags()
+        if self.build_cache is None or flags is None:
+            return None
+        key = self.build_cache.key(self.image_id(), flags, Path(file_name).read_bytes())
+        if self.build_cache.restore(key, self.local('prog', 'build')):
+            return None
+        return key
+
+    def save_build(self, key: str | None):
+        # the run scripts put a successful build into `data/build`
+        if key is not None and self.build_cache is not None and self.local('data', 'build').is_dir():
+            self.build_cache.store(key, self.local('data', 'build'))
+
     def copy_script_and_code(self, file_name: PathLike[str], script_name: str, moved_file_name: str):
-        shutil.copyfile(self.local('chore', script_name), self.local('data', script_name))
+        shutil.copyfile(self.chore_dir / script_name, self.local('data', script_name))
         shutil.copyfile(file_name, self.local('prog', moved_file_name))
 
     def start_container(self, container_name: str, command: str) -> Container:
@@ -126,25 +267,89 @@ class AbsTester(ABC):
             detach=True, network_mode='none', working_dir='/work', stderr=True,
             volumes=[f'{self.local("prog")}:/prog:ro',
                      f'{self.local("data")}:/data'],
+            environment=self.limits.environment(),
             command=command,
         )
 
+    def exec_in_warm_container(self, command: str, timeout: int | float) -> str:
+        assert self.warm is not None
+        api = self.docker.api
+        started = time.perf_counter()
+        exec_id = api.exec_create(
+            self.warm.container.id, command, workdir='/work', environment=self.limits.environment(),
+        )['Id']
+        # the deadline is kept here: docker-py reads the output of an exec with the client's
+        # default 60 s socket timeout, which a long run would hit first
+        sock = api.exec_start(exec_id, socket=True)
+        disable_socket_timeout(sock)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            output = executor.submit(read_exec_output, sock)
+            try:
+                return output.result(timeout=timeout).decode()
+            except concurrent.futures.TimeoutError:
+                # the container is thrown away after the run anyway
+                self.warm.container.kill()
+                raise MyTimeoutError()
+            finally:
+                self.record_run_time(started)
+
+    def watch_outputs(self, on_output: Callable[[int, str], bool], finished: threading.Event):
+        outputs = self.local('data', 'outputs')
+        index = self.local('data', 'outputs.idx')
+        seen = 0
+        index_size = 0
+        while not finished.wait(OUTPUT_POLL_INTERVAL):
+            try:
+                size = index.stat().st_size
+                if size == index_size:
+                    continue
+                index_size = size
+                with Bundle(outputs) as bundle:
+                    for i in range(seen, len(bundle)):
+                        if on_output(i, bundle[i].strip()):
+                            self.kill_running()
+                            return
+                    seen = len(bundle)
+            except FileNotFoundError:
+                pass
+
+    def kill_running(self):
+        container = self.warm.container if self.warm is not None else self.running
+        if container is not None:
+            try:
+                container.kill()
+            except docker.errors.APIError:
+                # has already exited
+                pass
+
+    def wait_container(self, container: Container, timeout: int | float):
+        """
+        Blocks until the container exits, the deadline is enforced by the HTTP read timeout
+        """
+        try:
+            container.wait(timeout=timeout)
+        except requests.exceptions.RequestException:
+            container.stop(timeout=5)
+            raise MyTimeoutError()
+
+    def record_run_time(self, started: float):
+        self.run_times_ms.append(round((time.perf_counter() - started) * 1000, 1))
+
     def run_container(self, container_name: str, command: str, timeout: int | float) -> str:
+        if self.warm is not None and self.warm.image == container_name:
+            return self.exec_in_warm_container(command, timeout)
+
         container: Container | None = None
+        started = time.perf_counter()
         try:
             container = self.start_container(container_name, command)
-            t_start = time.time()
-            while container.status != 'exited':
-                # refresh info
-                container.reload()
-                time.sleep(1)
-                if time.time() - t_start > timeout:
-                    container.stop(timeout=5)
-                    raise MyTimeoutError()
-
+            self.running = container
+            self.wait_container(container, timeout)
             return container.logs().decode()
 
         finally:
+            self.running = None
+            self.record_run_time(started)
             if container is not None:
                 try:
                     # I will be happy if someone explain to me why the second container
@@ -158,23 +363,31 @@ class AbsTester(ABC):
                     pass
 
     def read_output(self, n_tests: int) -> list[str]:
-        output = []
-        for i in range(n_tests):
-            try:
-                with open(self.local('data', f'output{i}.txt')) as file:
-                    output.append(file.read().strip())
-            except FileNotFoundError:
-                output.append("")
+        output = [""] * n_tests
+        try:
+            with Bundle(self.local('data', 'outputs')) as bundle:
+                for i in range(min(n_tests, len(bundle))):
+                    output[i] = bundle[i].strip()
+        except FileNotFoundError:
+            # no test has been run, show the compiler's messages instead
+            compile_log = self.local('data', 'compile.txt')
+            if n_tests and compile_log.exists():
+                output[0] = compile_log.read_text(errors='replace').strip()
         return output
 
 
 class JavaTester(AbsTester):
+    image = 'gigatester/java:latest'
+
     def setup(self, file_name: PathLike[str]):
         self.copy_script_and_code(file_name, 'run_java.sh', 'Main.java')
 
+    def build_flags(self) -> str | None:
+        return 'javac'
+
     def run_container_for_tests(self, n_tests: int, timeout: int | float) -> str:
         return self.run_container(
-            'gigatester/java:latest',
+            self.image,
             f'/bin/bash /data/run_java.sh {n_tests} /prog/Main.java Main',
             timeout,
         )
@@ -182,84 +395,80 @@ class JavaTester(AbsTester):
     def setup_interactive(self, file_name: PathLike[str]):
         self.copy_script_and_code(file_name, 'run_java_int.sh', 'Main.java')
 
-    def start_interactive_container(self, n_tests: int) -> Container:
-        return self.start_container(
-            "gigatester/java:latest",
-            f'/bin/bash /data/run_java_int.sh {n_tests} /prog/Main.java Main',
-        )
+    def interactive_command(self) -> str:
+        return '/bin/bash /data/run_java_int.sh /prog/Main.java Main'
 
 
 class CppTester(AbsTester):
+    image = 'gigatester/cpp:latest'
     version: str
 
-    def __init__(self, work_dir: Path, docker_engine: docker.DockerClient, /, *, version: str):
-        super().__init__(work_dir, docker_engine)
+    def __init__(
+            self,
+            work_dir: Path,
+            docker_engine: Callable[[], docker.DockerClient],
+            build_cache: BuildCache | None = None,
+            /, *,
+            version: str,
+    ):
+        super().__init__(work_dir, docker_engine, build_cache)
         self.version = version
 
     def setup(self, file_name: PathLike[str]):
         self.copy_script_and_code(file_name, 'run_cpp.sh', 'main.cpp')
 
+    def build_flags(self) -> str | None:
+        return f'-O2 --std=c++{self.version}'
+
     def run_container_for_tests(self, n_tests: int, timeout: int | float) -> str:
         return self.run_container(
-            'gigatester/cpp:latest',
+            self.image,
             f'/bin/bash /data/run_cpp.sh {n_tests} {self.version} /prog/main.cpp',
             timeout,
         )
 
-    def process_log(self, outputs: list[str], log: str) -> list[str]:
-        # Add segmentation faults etc. from the log
-        return split_log_by_tests(log, outputs, len(outputs))
-
     def setup_interactive(self, file_name: PathLike[str]):
         self.copy_script_and_code(file_name, 'run_cpp_int.sh', 'main.cpp')
 
-    def start_interactive_container(self, n_tests: int) -> Container:
-        return self.start_container(
-            "gigatester/cpp:latest",
-            f'/bin/bash /data/run_cpp_int.sh {n_tests} {self.version} /prog/main.cpp',
-        )
+    def interactive_command(self) -> str:
+        return f'/bin/bash /data/run_cpp_int.sh {self.version} /prog/main.cpp'
 
 
 class CSharpTester(AbsTester):
+    image = 'gigatester/cs:latest'
+    start_timeout = 25
+
     def setup(self, file_name: PathLike[str]):
         self.copy_script_and_code(file_name, 'run_cs.sh', 'main.cs')
-        shutil.copyfile(self.local('chore', 'cs.csproj'), self.local('data', 'cs.csproj'))
+        shutil.copyfile(self.chore_dir / 'cs.csproj', self.local('data', 'cs.csproj'))
+
+    def build_flags(self) -> str | None:
+        return (self.chore_dir / 'cs.csproj').read_text()
 
     def run_container_for_tests(self, n_tests: int, timeout: int | float) -> str:
         return self.run_container(
-            'gigatester/cs:latest',
+            self.image,
             f'/bin/bash /data/run_cs.sh {n_tests} /prog/main.cs Program',
             timeout,
         )
 
-    def process_log(self, outputs: list[str], log: str) -> list[str]:
-        # Add errors etc. from the log
-        # Exclude 'core dumped' since dotnet prints its own error message
-        return split_log_by_tests(
-            log,
-            outputs,
-            len(outputs),
-            lambda extra: bool(extra) and 'core dumped' not in extra,
-        )
-
     def setup_interactive(self, file_name: PathLike[str]):
         self.copy_script_and_code(file_name, 'run_cs_int.sh', 'main.cs')
-        shutil.copyfile(self.local('chore', 'cs.csproj'), self.local('data', 'cs.csproj'))
+        shutil.copyfile(self.chore_dir / 'cs.csproj', self.local('data', 'cs.csproj'))
 
-    def start_interactive_container(self, n_tests: int) -> Container:
-        return self.start_container(
-            "gigatester/cs:latest",
-            f'/bin/bash /data/run_cs_int.sh {n_tests} /prog/main.cs Program',
-        )
+    def interactive_command(self) -> str:
+        return '/bin/bash /data/run_cs_int.sh /prog/main.cs Program'
 
 
 class PythonTester(AbsTester):
+    image = 'gigatester/py:latest'
+
     def setup(self, file_name: PathLike[str]):
         self.copy_script_and_code(file_name, 'run_py.sh', 'main.py')
 
     def run_container_for_tests(self, n_tests: int, timeout: int | float) -> str:
         return self.run_container(
-            'gigatester/py:latest',
+            self.image,
             f'/bin/bash /data/run_py.sh {n_tests} /prog/main.py',
             timeout,
         )
@@ -267,24 +476,39 @@ class PythonTester(AbsTester):
     def setup_interactive(self, file_name: PathLike[str]):
         self.copy_script_and_code(file_name, 'run_py_int.sh', 'main.py')
 
-    def start_interactive_container(self, n_tests: int) -> Container:
-        return self.start_container(
-            "gigatester/py:latest",
-            f'/bin/bash /data/run_py_int.sh {n_tests} /prog/main.py',
-        )
+    def interactive_command(self) -> str:
+        return '/bin/bash /data/run_py_int.sh /prog/main.py'
 
 
-if os.getenv('DEBUG'):
-    _docker_engine = docker.DockerClient(base_url='unix://home/max/.docker/desktop/docker.sock')
-else:
-    _docker_engine = docker.DockerClient()
+def make_docker_engine() -> docker.DockerClient:
+    if os.getenv('DEBUG'):
+        return docker.DockerClient(base_url='unix://home/max/.docker/desktop/docker.sock')
+    return docker.DockerClient()
+
+
+# the client and the process which has made it
+_docker_engine: tuple[int, docker.DockerClient] | None = None
+
+
+def docker_engine() -> docker.DockerClient:
+    """
+    The client of the current process, made on the first use.
+    A forked worker makes its own: requests of several processes on the connections
+    of one pool would get each other's responses.
+    """
+    global _docker_engine
+    if _docker_engine is None or _docker_engine[0] != os.getpid():
+        _docker_engine = (os.getpid(), make_docker_engine())
+    return _docker_engine[1]
+
 
 work_dir = pathlib.Path().absolute()
-java_tester = JavaTester(work_dir, _docker_engine)
-cpp17_tester = CppTester(work_dir, _docker_engine, version='17')
-cpp20_tester = CppTester(work_dir, _docker_engine, version='20')
-cs_tester = CSharpTester(work_dir, _docker_engine)
-py_tester = PythonTester(work_dir, _docker_engine)
+build_cache = BuildCache(work_dir / 'cache' / 'build', int(os.environ.get('BUILD_CACHE_MB', 1024)) * 2**20)
+java_tester = JavaTester(work_dir, docker_engine, build_cache)
+cpp17_tester = CppTester(work_dir, docker_engine, build_cache, version='17')
+cpp20_tester = CppTester(work_dir, docker_engine, build_cache, version='20')
+cs_tester = CSharpTester(work_dir, docker_engine, build_cache)
+py_tester = PythonTester(work_dir, docker_engine, build_cache)
 
 TESTER_DICT: dict[Literal['java', 'cpp17', 'cpp20', 'cs', 'py'], AbsTester] = {
     'java': java_tester,
@@ -294,4 +518,4 @@ TESTER_DICT: dict[Literal['java', 'cpp17', 'cpp20', 'cs', 'py'], AbsTester] = {
     'py': py_tester,
 }
 
-__all__ = ['AbsTester', 'TESTER_DICT', 'split_log_by_tests']
+__all__ = ['AbsTester', 'TESTER_DICT', 'docker_engine']
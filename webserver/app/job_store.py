@@ -0,0 +1,176 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Any
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    task TEXT NOT NULL,
+    language TEXT NOT NULL,
+    program TEXT NOT NULL,
+    -- queued, running or done
+    status TEXT NOT NULL DEFAULT 'queued',
+    worker TEXT,
+    lease_expires REAL,
+    result TEXT,
+    created REAL NOT NULL,
+    -- leases of the job so far
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+CREATE INDEX IF NOT EXISTS jobs_user ON jobs (user_id, status);
+"""
+
+
+class JobStore:
+    """
+    Submissions and their results in SQLite, so a restart of the webserver or of a tester loses nothing.
+    A worker leases a job for `ttl` seconds and extends the lease with heartbeats;
+    a job whose lease has expired is handed out again and the late result of the old lease is rejected.
+    After `max_attempts` leases have expired the job is given up (see `give_up`).
+    """
+
+    def __init__(self, path: str, max_attempts: int = 3):
+        self.max_attempts = max_attempts
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+        # sync endpoints run in a thread pool
+        self.lock = threading.Lock()
+
+    def add(self, user_id: str, task: str, language: str, program: str) -> int:
+        """
+        :return: the id of the job, testers derive the seeds of its tests from it
+        """
+        with self.lock:
+            cursor = self.db.execute(
+                'INSERT INTO jobs (user_id, task, language, program, created) VALUES (?, ?, ?, ?, ?)',
+                (user_id, task, language, program, time.time()),
+            )
+        return cursor.lastrowid  # type: ignore
+
+    def active_users(self) -> list[str]:
+        """
+        Users with a queued or running job, in the order of submission
+        """
+        with self.lock:
+            rows = self.db.execute("SELECT user_id FROM jobs WHERE status != 'done' ORDER BY id").fetchall()
+        return [row['user_id'] for row in rows]
+
+    def lease(self, worker: str, ttl: float) -> dict[str, Any] | None:
+        """
+        Gives the oldest queued job, or a running one whose lease has expired, to the worker
+        """
+        now = time.time()
+        with self.lock:
+            self.db.execute('BEGIN IMMEDIATE')
+            try:
+                row = self.db.execute(
+                    "SELECT * FROM jobs WHERE status = 'queued' "
+                    "OR (status = 'running' AND lease_expires < ? AND attempts < ?) "
+                    "ORDER BY id LIMIT 1",
+                    (now, self.max_attempts),
+                ).fetchone()
+                if row is not None:
+                    self.db.execute(
+                        "UPDATE jobs SET status = 'running', worker = ?, lease_expires = ?, attempts = attempts + 1 "
+                        "WHERE id = ?",
+                        (worker, now + ttl, row['id']),
+                    )
+                self.db.execute('COMMIT')
+            except BaseException:
+                self.db.execute('ROLLBACK')
+                raise
+        if row is None:
+            return None
+        return {k: row[k] for k in ('id', 'user_id', 'task', 'language', 'program')}
+
+    def give_up(self) -> list[str]:
+        """
+        Finishes with an error the jobs whose last lease has expired, they may be what kills the testers
+        :return: the users of the jobs
+        """
+        now = time.time()
+        with self.lock:
+            self.db.execute('BEGIN IMMEDIATE')
+            try:
+                rows = self.db.execute(
+                    "SELECT id, user_id, attempts FROM jobs "
+                    "WHERE status = 'running' AND lease_expires < ? AND attempts >= ?",
+                    (now, self.max_attempts),
+                ).fetchall()
+                for row in rows:
+                    result = {'code': -1, 'error': f"Testing has failed {row['attempts']} times"}
+                    self.db.execute(
+                        "UPDATE jobs SET status = 'done', result = ?, program = '', lease_expires = NULL "
+                        "WHERE id = ?",
+                        (json.dumps(result), row['id']),
+                    )
+                self.db.execute('COMMIT')
+            except BaseException:
+                self.db.execute('ROLLBACK')
+                raise
+        return [row['user_id'] for row in rows]
+
+    def heartbeat(self, job_id: int, worker: str, ttl: float) -> bool:
+        """
+        :return: False if the worker does not hold the lease anymore
+        """
+        with self.lock:
+            cursor = self.db.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (time.time() + ttl, job_id, worker),
+            )
+        return cursor.rowcount == 1
+
+    def finish(self, job_id: int, worker: str, result: dict) -> bool:
+        """
+        Stores the result of a leased job, the program is not needed anymore
+        :return: False if the worker does not hold the lease anymore
+        """
+        with self.lock:
+            cursor = self.db.execute(
+                "UPDATE jobs SET status = 'done', result = ?, program = '', lease_expires = NULL "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                (json.dumps(result), job_id, worker),
+            )
+        return cursor.rowcount == 1
+
+    def has_result(self, user_id: str) -> bool:
+        with self.lock:
+            row = self.db.execute(
+                "SELECT 1 FROM jobs WHERE user_id = ? AND status = 'done' LIMIT 1", (user_id,)
+            ).fetchone()
+        return row is not None
+
+    def peek_result(self, user_id: str) -> dict | None:
+        """
+        The latest result of the user, which is kept
+        """
+        with self.lock:
+            row = self.db.execute(
+                "SELECT result FROM jobs WHERE user_id = ? AND status = 'done' ORDER BY id DESC LIMIT 1", (user_id,)
+            ).fetchone()
+        return json.loads(row['result']) if row is not None else None
+
+    def drop_results(self, user_id: str):
+        with self.lock:
+            self.db.execute("DELETE FROM jobs WHERE user_id = ? AND status = 'done'", (user_id,))
+
+    def take_result(self, user_id: str) -> dict | None:
+        """
+        Removes the results of the user and returns the latest one
+        """
+        with self.lock:
+            row = self.db.execute(
+                "SELECT result FROM jobs WHERE user_id = ? AND status = 'done' ORDER BY id DESC LIMIT 1", (user_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.db.execute("DELETE FROM jobs WHERE user_id = ? AND status = 'done'", (user_id,))
+        return json.loads(row['result'])
@@ -1,4 +1,6 @@
+import json
 import random
+import re
 import time
 from collections import defaultdict
 from typing import Annotated
@@ -11,16 +13,20 @@ from fastapi import (
     Form,
     Body,
     Cookie,
-    BackgroundTasks,
     HTTPException,
 )
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import PlainTextResponse, RedirectResponse
+from fastapi.responses import PlainTextResponse, RedirectResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
+from starlette.background import BackgroundTask
 from starlette.responses import JSONResponse
 
 from .structures import Update, Result, Config
+from .job_store import JobStore
 from .log import init_web
+from .notifier import Notifier
+from .ticket_queue import TicketQueue
 
 with open('config.json') as f:
     config = Config.model_validate_json(f.read())
@@ -31,9 +37,24 @@ SECRET = config.secret.get_secret_value()
 MAX_QUEUE = config.queue_size
 MAX_REG = config.max_registrations
 VERSION_ID = config.frontend_version
-
-queue: list[str] = []
-results: dict[str, Result] = {}
+LEASE_TTL = config.lease_ttl
+# the longest wait of a tester for a job in one request
+MAX_LEASE_WAIT = 30
+# seconds between keep-alive comments of a status stream, the longest wait of a status poll
+STATUS_WAIT = 25
+# the user_id cookies handed out by `reg`
+USER_ID = re.compile('[0-9a-f]{64}')
+
+store = JobStore(config.database, config.max_attempts)
+# users with a queued or running job, the store survives restarts and the queue is rebuilt from it
+queue = TicketQueue()
+for waiting_user in store.active_users():
+    if waiting_user not in queue:
+        queue.append(waiting_user)
+# waiting testers are woken up by a new job
+job_added = Notifier()
+# clients are told about new positions and results
+queue_changed = Notifier()
 regs = defaultdict(int)
 ban_list: list[str] = []
 
@@ -52,10 +73,14 @@ init_web(app)
 
 
 def send_program(program_text: str, user: str, language: str, task: str):
-    timestamp = int(time.time())
-    f = open(f'/queue/{timestamp}_{user}_{task}_{language}.txt', 'w')
-    f.write(program_text)
-    f.close()
+    store.add(user, task, language, program_text)
+    job_added.notify()
+
+
+def check_token(token: str):
+    if token != SECRET:
+        print("Bad token", flush=True)
+        raise HTTPException(401, "Invalid token")
 
 
 @api.middleware("http")
@@ -73,10 +98,11 @@ async def reg(request: Request, call_next):
         return RedirectResponse(f"/static/form.html", status.HTTP_302_FOUND)
 
     user_id = request.cookies.get('user_id')
-    if user_id is not None or request.url.path.startswith('/static/'):
+    valid = user_id is not None and USER_ID.fullmatch(user_id) is not None
+    if valid or request.url.path.startswith('/static/'):
         return await call_next(request)
 
-    if user_id is None:
+    if not valid:
         # regs[request.client.host] += 1
         # if regs[request.client.host] >= MAX_REG and request.client.host not in ban_list:
         #     ban_list.append(request.client.host)
@@ -104,8 +130,7 @@ async def get_task_list():
 
 
 @api.post('/submit')
-async def form(background_tasks: BackgroundTasks,
-               language: Annotated[str, Form()],
+async def form(language: Annotated[str, Form()],
                task: Annotated[str, Form()],
                program: Annotated[str | None, Form()] = None,
                user_id: Annotated[str | None, Cookie()] = None):
@@ -113,7 +138,7 @@ async def form(background_tasks: BackgroundTasks,
         raise HTTPException(400, "No input")
     if language not in LANGUAGES or task not in TASKS:
         raise HTTPException(400, "")
-    if user_id is None:
+    if user_id is None or USER_ID.fullmatch(user_id) is None:
         raise HTTPException(401, "Get a user_id cookie first")
 
     response = JSONResponse({'user_id': user_id})
@@ -122,8 +147,9 @@ async def form(background_tasks: BackgroundTasks,
     if user_id not in queue:
         if len(queue) >= MAX_QUEUE:
             raise HTTPException(503, "Busy")
-        background_tasks.add_task(send_program, program, user_id, language, task)
+        send_program(program, user_id, language, task)
         queue.append(user_id)
+        queue_changed.notify()
     return response
 
 
@@ -132,8 +158,8 @@ def update(user_id: Annotated[str | None, Cookie()] = None):
     if user_id is None:
         raise HTTPException(400)
     if user_id in queue:
-        return Update(code=1, position=queue.index(user_id) + 1)
-    elif user_id in results:
+        return Update(code=1, position=queue.position(user_id))
+    elif store.has_result(user_id):
         return Update(code=0)
     else:
         raise HTTPException(400)
@@ -143,11 +169,82 @@ def update(user_id: Annotated[str | None, Cookie()] = None):
 def result(user_id: Annotated[str | None, Cookie()] = None):
     if user_id is None:
         raise HTTPException(400)
-    if user_id in results:
-        return results.pop(user_id)
+    taken = store.take_result(user_id)
+    if taken is not None:
+        return Result(**taken)
     raise HTTPException(400)
 
 
+async def status_of(user_id: str) -> dict | None:
+    """
+    The position of a queued user or the result; None if there is neither.
+    The result is kept until it has been sent (see `JobStore.drop_results`).
+    """
+    if user_id in queue:
+        return {'code': 1, 'position': queue.position(user_id)}
+    result = await run_in_threadpool(store.peek_result, user_id)
+    if result is not None:
+        return {'code': 0, 'result': Result(**result).model_dump(exclude_defaults=True)}
+    return None
+
+
+@api.get('/status')
+async def status_stream(user_id: Annotated[str | None, Cookie()] = None):
+    """
+    Server-sent events: `position` whenever the position changes, then `result` and the end of the stream
+    """
+    if user_id is None or (user_id not in queue and not await run_in_threadpool(store.has_result, user_id)):
+        raise HTTPException(400)
+
+    async def events():
+        version = queue_changed.version
+        position = None
+        while True:
+            status = await status_of(user_id)
+            if status is None:
+                yield 'event: gone\ndata: {}\n\n'
+                return
+            if status['code'] == 0:
+                yield f'event: result\ndata: {json.dumps(status["result"])}\n\n'
+                # the event has been sent, a dropped stream would have stopped at the yield
+                await run_in_threadpool(store.drop_results, user_id)
+                return
+            if status['position'] != position:
+                position = status['position']
+                yield f'event: position\ndata: {position}\n\n'
+            new_version = await queue_changed.wait(version, STATUS_WAIT)
+            if new_version == version:
+                # proxies close silent connections
+                yield ': keep-alive\n\n'
+            version = new_version
+
+    return StreamingResponse(
+        events(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+@api.get('/status/poll')
+async def status_poll(version: int = -1, user_id: Annotated[str | None, Cookie()] = None):
+    """
+    Long polling for clients without server-sent events: answers when the queue has changed
+    since `version` or in `STATUS_WAIT` seconds, the result comes with code 0
+    """
+    if user_id is None:
+        raise HTTPException(400)
+    if user_id in queue:
+        version = await queue_changed.wait(version, STATUS_WAIT)
+    status = await status_of(user_id)
+    if status is None:
+        raise HTTPException(400)
+    status['version'] = version
+    if status['code'] == 0:
+        # after the response has been sent
+        return JSONResponse(status, background=BackgroundTask(store.drop_results, user_id))
+    return status
+
+
 """
 Internal
 """
@@ -160,23 +257,64 @@ async def get_queue_size():
 
 @app.post("/ws_hello", response_class=PlainTextResponse)
 async def ws_hello(token: Annotated[str, Body(embed=True)]) -> str:
-    if token != SECRET:
-        print("Bad token", flush=True)
-        raise HTTPException(401, "Invalid token")
+    check_token(token)
+    return 'ok'
+
+
+@app.post("/lease")
+async def lease(
+        token: Annotated[str, Body()],
+        worker: Annotated[str, Body()],
+        wait: Annotated[float, Body()] = 0,
+) -> dict | None:
+    """
+    Gives the oldest job with its program to a tester's worker for `ttl` seconds.
+    Waits up to `wait` seconds for a job to come, null if none has.
+    """
+    check_token(token)
+    # testers ask for jobs all the time, so jobs which keep failing are cleaned up here
+    if given_up := await run_in_threadpool(store.give_up):
+        for user_id in given_up:
+            if user_id in queue:
+                queue.remove(user_id)
+        queue_changed.notify()
+    deadline = time.monotonic() + min(wait, MAX_LEASE_WAIT)
+    version = job_added.version
+    while (job := await run_in_threadpool(store.lease, worker, LEASE_TTL)) is None:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        version = await job_added.wait(version, remaining)
+    job['ttl'] = LEASE_TTL
+    return job
+
+
+@app.post("/heartbeat", response_class=PlainTextResponse)
+async def heartbeat(
+        token: Annotated[str, Body()],
+        job_id: Annotated[int, Body()],
+        worker: Annotated[str, Body()],
+) -> str:
+    check_token(token)
+    if not await run_in_threadpool(store.heartbeat, job_id, worker, LEASE_TTL):
+        raise HTTPException(409, "The lease has expired")
     return 'ok'
 
 
 @app.post("/ws", response_class=PlainTextResponse)
 async def internal(token: Annotated[str, Body()], data: dict) -> str:
-    if token != SECRET:
-        print("Bad token", flush=True)
-        raise HTTPException(401, "Invalid token")
+    check_token(token)
+    job_id = data.pop('job_id')
+    worker = data.pop('worker')
     user_id = data['user_id']
+    data['task'] = TASKS[data['task']].name
+    data['language'] = LANGUAGES[data['language']].name
+    if not await run_in_threadpool(store.finish, job_id, worker, Result(**data).model_dump(exclude_none=True)):
+        # the job has been given to another worker
+        return 'stale'
     if user_id in queue:
         queue.remove(user_id)
-        data['task'] = TASKS[data['task']].name
-        data['language'] = LANGUAGES[data['language']].name
-        results[user_id] = Result(**data)
+    queue_changed.notify()
     return 'ok'
 
 
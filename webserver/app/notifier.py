@@ -0,0 +1,28 @@
+import asyncio
+
+
+class Notifier:
+    """
+    Wakes every coroutine which waits for the next change, the version counts the changes
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.event = asyncio.Event()
+
+    def notify(self):
+        self.version += 1
+        self.event.set()
+        self.event = asyncio.Event()
+
+    async def wait(self, version: int, timeout: float) -> int:
+        """
+        Waits up to `timeout` seconds while the version is `version`
+        :return: the current version
+        """
+        if self.version == version:
+            try:
+                await asyncio.wait_for(self.event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.version
@@ -18,6 +18,12 @@ class Config(BaseModel):
     queue_size: int
     max_registrations: int
     frontend_version: int
+    # jobs and results, kept over restarts
+    database: str = '/state/jobs.db'
+    # seconds a tester holds a job without a heartbeat
+    lease_ttl: int = 60
+    # leases of a job before it is given up with an error
+    max_attempts: int = 3
 
 class Update(BaseModel):
     code: int
@@ -35,4 +41,8 @@ class Result(BaseModel):
     language: str | None = None
     task: str | None = None
     interactive: bool | None = None
+    # max time and memory over the tests
+    stats: dict[str, int] | None = None
+    # time and memory of the failed tests
+    test_stats: list[dict[str, int | str] | None] | None = None
 
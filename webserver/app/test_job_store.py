@@ -0,0 +1,80 @@
+import pytest
+
+from .job_store import JobStore
+
+
+@pytest.fixture
+def store(tmp_path) -> JobStore:
+    return JobStore(str(tmp_path / 'jobs.db'), max_attempts=2)
+
+
+def add(store: JobStore, user_id: str) -> int:
+    return store.add(user_id, 'task', 'py', 'print()')
+
+
+def test_jobs_are_leased_in_order(store):
+    first = add(store, 'a')
+    second = add(store, 'b')
+    assert store.lease('w1', 60)['id'] == first
+    assert store.lease('w2', 60)['id'] == second
+    assert store.lease('w3', 60) is None
+    assert store.active_users() == ['a', 'b']
+
+
+def test_heartbeat_and_finish_need_the_lease(store):
+    job_id = add(store, 'a')
+    store.lease('w1', 60)
+    assert store.heartbeat(job_id, 'w1', 60)
+    assert not store.heartbeat(job_id, 'w2', 60)
+    assert not store.finish(job_id, 'w2', {'code': 0})
+    assert store.finish(job_id, 'w1', {'code': 0})
+    assert not store.heartbeat(job_id, 'w1', 60)
+    assert store.active_users() == []
+
+
+def test_expired_lease_is_handed_out_again(store):
+    job_id = add(store, 'a')
+    store.lease('w1', -1)
+    job = store.lease('w2', 60)
+    assert job is not None and job['id'] == job_id
+    # the late result of the old lease is rejected
+    assert not store.finish(job_id, 'w1', {'code': 0})
+    assert store.finish(job_id, 'w2', {'code': 0})
+
+
+def test_results_are_taken_once(store):
+    job_id = add(store, 'a')
+    store.lease('w1', 60)
+    store.finish(job_id, 'w1', {'code': 1})
+    assert store.has_result('a')
+    assert store.take_result('a') == {'code': 1}
+    assert not store.has_result('a')
+    assert store.take_result('a') is None
+
+
+def test_job_is_given_up_after_max_attempts(store):
+    add(store, 'a')
+    store.lease('w1', -1)
+    assert store.give_up() == []
+    store.lease('w2', -1)
+    assert store.lease('w3', 60) is None
+    assert store.give_up() == ['a']
+    assert store.give_up() == []
+    assert store.take_result('a')['code'] == -1
+
+
+def test_live_lease_is_not_given_up(store):
+    add(store, 'a')
+    store.lease('w1', -1)
+    store.lease('w2', 60)
+    assert store.give_up() == []
+
+
+def test_peeked_result_is_kept_until_dropped(store):
+    job_id = add(store, 'a')
+    store.lease('w1', 60)
+    store.finish(job_id, 'w1', {'code': 0})
+    assert store.peek_result('a') == {'code': 0}
+    assert store.peek_result('a') == {'code': 0}
+    store.drop_results('a')
+    assert store.peek_result('a') is None
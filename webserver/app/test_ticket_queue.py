@@ -0,0 +1,50 @@
+import random
+
+import pytest
+
+from .ticket_queue import TicketQueue
+
+
+def test_positions_follow_the_order_of_arrival():
+    queue = TicketQueue()
+    for user_id in 'abc':
+        queue.append(user_id)
+    assert len(queue) == 3
+    assert [queue.position(u) for u in 'abc'] == [1, 2, 3]
+
+
+def test_removal_moves_the_users_behind_forward():
+    queue = TicketQueue()
+    for user_id in 'abcd':
+        queue.append(user_id)
+    queue.remove('b')
+    assert 'b' not in queue
+    assert [queue.position(u) for u in 'acd'] == [1, 2, 3]
+    queue.append('b')
+    assert queue.position('b') == 4
+
+
+def test_duplicate_is_rejected():
+    queue = TicketQueue()
+    queue.append('a')
+    with pytest.raises(ValueError):
+        queue.append('a')
+
+
+def test_matches_a_list_through_compactions():
+    rng = random.Random(0)
+    queue = TicketQueue()
+    waiting: list[str] = []
+    for step in range(2000):
+        if waiting and rng.random() < 0.5:
+            user_id = waiting.pop(rng.randrange(len(waiting)))
+            queue.remove(user_id)
+        else:
+            user_id = f'user{step}'
+            waiting.append(user_id)
+            queue.append(user_id)
+        assert len(queue) == len(waiting)
+    for position, user_id in enumerate(waiting, 1):
+        assert queue.position(user_id) == position
+    # the served users have been compacted away
+    assert len(queue.tree) <= 2 * len(waiting) + 65
@@ -0,0 +1,59 @@
+class TicketQueue:
+    """
+    A FIFO of users waiting for testing.
+    Every user gets the next ticket, a Fenwick tree over the tickets counts the users
+    who are still waiting, so membership costs O(1) and removal and the position O(log n).
+    """
+
+    def __init__(self):
+        self.tickets: dict[str, int] = {}
+        # 1-based, tree[i] counts the waiting users with tickets (i - lowbit(i), i]
+        self.tree: list[int] = [0]
+
+    def __len__(self) -> int:
+        return len(self.tickets)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self.tickets
+
+    def prefix(self, ticket: int) -> int:
+        count = 0
+        while ticket > 0:
+            count += self.tree[ticket]
+            ticket -= ticket & -ticket
+        return count
+
+    def append(self, user_id: str):
+        if user_id in self.tickets:
+            raise ValueError(f'{user_id} is already in the queue')
+        ticket = len(self.tree)
+        # the new node covers (ticket - lowbit, ticket], only the new ticket is waiting
+        # among those which are not counted by the prefix before it
+        self.tree.append(1 + self.prefix(ticket - 1) - self.prefix(ticket - (ticket & -ticket)))
+        self.tickets[user_id] = ticket
+
+    def remove(self, user_id: str):
+        ticket = self.tickets.pop(user_id)
+        while ticket < len(self.tree):
+            self.tree[ticket] -= 1
+            ticket += ticket & -ticket
+        if len(self.tree) > 2 * len(self.tickets) + 64:
+            self.compact()
+
+    def position(self, user_id: str) -> int:
+        """
+        1 for the first user in the queue
+        """
+        return self.prefix(self.tickets[user_id])
+
+    def compact(self):
+        """
+        Renumbers the tickets of the waiting users, so the tree does not grow with the served ones
+        """
+        order = sorted(self.tickets, key=self.tickets.__getitem__)
+        self.tickets = {user_id: i for i, user_id in enumerate(order, 1)}
+        self.tree = [0] + [1] * len(order)
+        for i in range(1, len(self.tree)):
+            parent = i + (i & -i)
+            if parent < len(self.tree):
+                self.tree[parent] += self.tree[i]
@@ -29,6 +29,192 @@ function getEditorMode(language) {
     return "ace/mode/c_cpp";
 }
 
+function showPosition(position) {
+    if (position === 1) {
+        document.querySelector(".cooking .text").innerHTML = `<span style="color: #317721;">Watermelons</span> will stay with you while we process your code...`;
+        return;
+    }
+    let suffix;
+    if (position === 2)
+        suffix = "nd";
+    else if (position === 3)
+        suffix = "rd";
+    else
+        suffix = "th";
+
+    document.querySelector("#pos").innerHTML = `${position}<span style="font-size: .7em;">${suffix}</span>`;
+}
+
+function showResult(json) {
+    document.body.classList.add("res");
+    document.body.classList.remove("wait");
+
+    var verdicts = {
+        "-1": "Critical Error",
+        "2": "Time Limit Exceeded",
+        "1": "Wrong Answer",
+        "0": "Arbuz"
+    };
+
+    document.querySelector("#verdict").innerText = verdicts[json['code']];
+    document.querySelector("#verdict").classList.add(
+        verdicts[json['code']].toLowerCase().replace(/ /g, "-")
+    );
+
+    function fadein_result() {
+        let elem = document.querySelector(".result");
+        elem.classList.add('fadein');
+        setTimeout(
+            () => {
+                elem.classList.remove('fadein');
+            },
+            300
+        );
+    }
+
+    document.querySelector(".data").innerHTML = "<span class='no_tests'>No tests to show.</span>";
+    if (json.code === 2) {
+        fadein_result();
+        document.querySelector("#time").innerHTML = `Time: ${Math.round(json['time'] * 100) / 100}s`;
+        document.querySelector("#tests").innerHTML = `Tests: ${json['tests']}`;
+        if (json['tests'] === 1) {
+            let input;
+            input = json['input'][0];
+
+            input = input.replace(/</g, "&lt;").replace(/>/g, "&gt;");
+
+            document.querySelector(".data").innerHTML = "";
+            document.querySelector(".data").insertAdjacentHTML("beforeend", `
+        <span class="line">
+            <span class="text_block">
+                Input:
+                <br>
+                <textarea class="input code">${input}</textarea>
+            </span>
+        </span>`);
+        }
+    } else if (json.code === 1) {
+        fadein_result();
+        document.querySelector("#time").innerHTML = `Time: ${Math.round(json['time'] * 100) / 100}s`;
+        document.querySelector("#tests").innerHTML = `Tests: ${json['tests']}  Successful: ${json['tests'] - json['input'].length}  Failed: ${json['input'].length}`;
+        document.querySelector(".data").innerHTML = "";
+        for (let i = 0; i < json['output'].length; i++) {
+            let input, output, expected;
+            input = json['input'][i];
+            output = json['output'][i];
+            expected = json['expected'][i];
+            let interactive = json['interactive'];
+
+            input = input.replace(/</g, "&lt;").replace(/>/g, "&gt;");
+            output = output.replace(/</g, "&lt;").replace(/>/g, "&gt;");
+            expected = expected.replace(/</g, "&lt;").replace(/>/g, "&gt;");
+
+            let [inputHeader, expectedHeader, outputHeader] = !interactive
+                ? [
+                    'Input', 'Correct output', 'Your output',
+                ] : [
+                    'Start data', 'Correct interaction', 'Your interaction',
+                ];
+
+            document.querySelector(".data").insertAdjacentHTML("beforeend", `
+        <span class="result_grid">
+            <div>${inputHeader}:</div>
+            <div>${expectedHeader}:</div>
+            <div>${outputHeader}:</div>
+            <textarea class="input code">${input}</textarea>
+            <textarea class="expected code">${expected}</textarea>
+            <textarea class="output code">${output}</textarea>
+        </span>`);
+        }
+
+        const sticker = `
+            <img alt=""
+                src="/static/failure.webp"
+                class="failure-watermelon" />`;
+        document.body.insertAdjacentHTML("beforeend", sticker);
+        let failure = document.querySelector(".failure-watermelon");
+        failure.style.animationPlayState = "running";
+    } else if (json.code === 0) {
+        document.querySelector("#time").innerHTML = `Time: ${Math.round(json['time'] * 100) / 100}s`;
+        document.querySelector("#tests").innerHTML = `Tests: ${json['tests']}`;
+        document.body.classList.add("watermelon-rain");
+        document.querySelector(".result").classList.add("presuccess");
+        setTimeout(() => {
+            document.querySelector(".result").classList.add("success");
+        }, 300);
+        const watermelon = `
+            <img alt=""
+                src="https://purepng.com/public/uploads/large/big-green-watermelon-t18.png"
+                class="falling-watermelon" />`;
+        document.body.insertAdjacentHTML("beforeend", watermelon.repeat(30));
+        let watermelons = document.querySelectorAll(".falling-watermelon");
+        let totalWatermelons = watermelons.length;
+        watermelons.forEach((watermelon, index) => {
+            watermelon.style.animationDelay = `${Math.random()}s`;
+            watermelon.style.left = `${(index / totalWatermelons) * 100}vw`;
+            watermelon.style.animationDuration = `${Math.random() * 2 + 1}s`;
+            watermelon.style.animationPlayState = "running";
+            watermelon.style.zIndex = Math.random() < 0.5 ? 4 : 6;
+        });
+    }
+}
+
+// long polling for browsers and proxies without server-sent events
+function pollStatus(version) {
+    fetch(`/status/poll?version=${version}`, {
+        method: "GET",
+        credentials: "include"
+    }).then(response => {
+        if (response.ok) {
+            return response.json();
+        } else if (response.status === 400) {
+            // nothing is queued and there is no result
+            return null;
+        } else {
+            throw new Error('Network response was not ok');
+        }
+    }).then(json => {
+        if (json === null) {
+            return;
+        }
+        if (json['code'] === 1) {
+            showPosition(json['position']);
+            pollStatus(json['version']);
+        } else {
+            showResult(json['result']);
+        }
+    }).catch(error => {
+        console.error('There has been a problem with your fetch operation:', error);
+        setTimeout(() => pollStatus(version), 2000);
+    });
+}
+
+// the server pushes the position and then the result
+function watchStatus() {
+    if (window.EventSource === undefined) {
+        pollStatus(-1);
+        return;
+    }
+    let source = new EventSource("/status");
+    let done = false;
+    source.addEventListener("position", e => showPosition(Number(e.data)));
+    source.addEventListener("result", e => {
+        done = true;
+        source.close();
+        showResult(JSON.parse(e.data));
+    });
+    source.addEventListener("gone", () => {
+        done = true;
+        source.close();
+    });
+    source.onerror = () => {
+        // a broken stream is reconnected by the browser, a refused one is not
+        if (!done && source.readyState === EventSource.CLOSED) {
+            pollStatus(-1);
+        }
+    };
+}
+
 async function loadTasks() {
     let tasks = JSON.parse(localStorage.getItem('tasks') || "[]");
     let elem = document.querySelector('#tasks');
@@ -119,160 +305,8 @@ window.addEventListener("load", () => {
             } else {
                 throw new Error('Network response was not ok');
             }
-        }).then(json => {
-            let user_id = json['user_id'];
-            let interval = setInterval(() => {
-                fetch("/update", {
-                    method: "GET",
-                    headers: {
-                        "Cookie": `user_id=${user_id}, task=${document.querySelector("#tasks").value}, language=${document.querySelector("#languages").value}`
-                    }
-                }).then(response => {
-                    if (response.ok) {
-                        return response.json();
-                    } else {
-                        throw new Error('Network response was not ok');
-                    }
-                }).then(json => {
-                    if (json['code'] !== 1) {
-                        clearInterval(interval);
-                        document.body.classList.add("res");
-                        document.body.classList.remove("wait");
-                        fetch("/result", {
-                            method: "GET",
-                            headers: {
-                                "Cookie": `user_id=${user_id}`
-                            }
-                        }).then(response => response.json()).then(json => {
-                            var verdicts = {
-                                "-1": "Critical Error",
-                                "2": "Time Limit Exceeded",
-                                "1": "Wrong Answer",
-                                "0": "Arbuz"
-                            };
-
-                            document.querySelector("#verdict").innerText = verdicts[json['code']];
-                            document.querySelector("#verdict").classList.add(
-                                verdicts[json['code']].toLowerCase().replace(/ /g, "-")
-                            );
-
-                            function fadein_result() {
-                                let elem = document.querySelector(".result");
-                                elem.classList.add('fadein');
-                                setTimeout(
-                                    () => {
-                                        elem.classList.remove('fadein');
-                                    },
-                                    300
-                                );
-                            }
-
-                            document.querySelector(".data").innerHTML = "<span class='no_tests'>No tests to show.</span>";
-                            if (json.code === 2) {
-                                fadein_result();
-                                document.querySelector("#time").innerHTML = `Time: ${Math.round(json['time'] * 100) / 100}s`;
-                                document.querySelector("#tests").innerHTML = `Tests: ${json['tests']}`;
-                                if (json['tests'] === 1) {
-                                    let input;
-                                    input = json['input'][0];
-
-                                    input = input.replace(/</g, "&lt;").replace(/>/g, "&gt;");
-
-                                    document.querySelector(".data").innerHTML = "";
-                                    document.querySelector(".data").insertAdjacentHTML("beforeend", `
-                                <span class="line">
-                                    <span class="text_block">
-                                        Input:
-                                        <br>
-                                        <textarea class="input code">${input}</textarea>
-                                    </span>
-                                </span>`);
-                                }
-                            } else if (json.code === 1) {
-                                fadein_result();
-                                document.querySelector("#time").innerHTML = `Time: ${Math.round(json['time'] * 100) / 100}s`;
-                                document.querySelector("#tests").innerHTML = `Tests: ${json['tests']}  Successful: ${json['tests'] - json['input'].length}  Failed: ${json['input'].length}`;
-                                document.querySelector(".data").innerHTML = "";
-                                for (let i = 0; i < json['output'].length; i++) {
-                                    let input, output, expected;
-                                    input = json['input'][i];
-                                    output = json['output'][i];
-                                    expected = json['expected'][i];
-                                    let interactive = json['interactive'];
-
-                                    input = input.replace(/</g, "&lt;").replace(/>/g, "&gt;");
-                                    output = output.replace(/</g, "&lt;").replace(/>/g, "&gt;");
-                                    expected = expected.replace(/</g, "&lt;").replace(/>/g, "&gt;");
-
-                                    let [inputHeader, expectedHeader, outputHeader] = !interactive
-                                        ? [
-                                            'Input', 'Correct output', 'Your output',
-                                        ] : [
-                                            'Start data', 'Correct interaction', 'Your interaction',
-                                        ];
-
-                                    document.querySelector(".data").insertAdjacentHTML("beforeend", `
-                                <span class="result_grid">
-                                    <div>${inputHeader}:</div>
-                                    <div>${expectedHeader}:</div>
-                                    <div>${outputHeader}:</div>
-                                    <textarea class="input code">${input}</textarea>
-                                    <textarea class="expected code">${expected}</textarea>
-                                    <textarea class="output code">${output}</textarea>
-                                </span>`);
-                                }
-
-                                const sticker = `
-                                    <img alt=""
-                                        src="/static/failure.webp"
-                                        class="failure-watermelon" />`;
-                                document.body.insertAdjacentHTML("beforeend", sticker);
-                                let failure = document.querySelector(".failure-watermelon");
-                                failure.style.animationPlayState = "running";
-                            } else if (json.code === 0) {
-                                document.querySelector("#time").innerHTML = `Time: ${Math.round(json['time'] * 100) / 100}s`;
-                                document.querySelector("#tests").innerHTML = `Tests: ${json['tests']}`;
-                                document.body.classList.add("watermelon-rain");
-                                document.querySelector(".result").classList.add("presuccess");
-                                setTimeout(() => {
-                                    document.querySelector(".result").classList.add("success");
-                                }, 300);
-                                const watermelon = `
-                                    <img alt=""
-                                        src="https://purepng.com/public/uploads/large/big-green-watermelon-t18.png"
-                                        class="falling-watermelon" />`;
-                                document.body.insertAdjacentHTML("beforeend", watermelon.repeat(30));
-                                let watermelons = document.querySelectorAll(".falling-watermelon");
-                                let totalWatermelons = watermelons.length;
-                                watermelons.forEach((watermelon, index) => {
-                                    watermelon.style.animationDelay = `${Math.random()}s`;
-                                    watermelon.style.left = `${(index / totalWatermelons) * 100}vw`;
-                                    watermelon.style.animationDuration = `${Math.random() * 2 + 1}s`;
-                                    watermelon.style.animationPlayState = "running";
-                                    watermelon.style.zIndex = Math.random() < 0.5 ? 4 : 6;
-                                });
-                            }
-                        });
-                    } else {
-                        let position = json['position'];
-                        if (position === 1) {
-                            document.querySelector(".cooking .text").innerHTML = `<span style="color: #317721;">Watermelons</span> will stay with you while we process your code...`;
-                            return;
-                        }
-                        let suffix;
-                        if (position === 2)
-                            suffix = "nd";
-                        else if (position === 3)
-                            suffix = "rd";
-                        else
-                            suffix = "th";
-
-                        document.querySelector("#pos").innerHTML = `${position}<span style="font-size: .7em;">${suffix}</span>`;
-                    }
-                }).catch(error => {
-                    console.error('There has been a problem with your fetch operation:', error);
-                });
-            }, 2000);
+        }).then(() => {
+            watchStatus();
         }).catch(error => {
             console.error('There has been a problem with your fetch operation:', error);
         });